@@ -1,23 +1,34 @@
 import os
+import cv2
+import shutil
 import pytest
 import tempfile
+import importlib.util
 
 import numpy as np
 
-from PIL import Image
-from typing import Tuple, Type
+from typing import Tuple
 from dataclasses import dataclass
 
 from enum import IntEnum
 
 from video_dataset.dataset import VideoDataset
-from video_dataset.video import VideoFromVideoFramesDirectory
-from video_dataset.annotations import AnnotationsFromFrameLevelTxtFileAnnotations
+from video_dataset.video import Video, VideoFromVideoFramesDirectory
+from video_dataset.annotations import Annotations, AnnotationsFromFrameLevelTxtFileAnnotations
 
 DEFAUlT_VIDEO_FPS = 8
 DEFAULT_VIDEO_WIDTH = 8
 DEFAULT_VIDEO_HEIGHT = 8
 DEFAULT_VIDEO_NUMBER_OF_CHANNELS = 3
+DEFAULT_FAKE_VIDEO_NUMBER_OF_FRAMES = 32
+
+def is_cuda_available():
+    if importlib.util.find_spec("torch") is None:
+        return False
+    
+    import torch
+    
+    return torch.cuda.is_available()
 
 @dataclass
 class DatasetConfiguration:
@@ -26,20 +37,21 @@ class DatasetConfiguration:
     ids_file_path: str | None
 
 def create_frame_level_video(videos_directory_path, id, number_of_frames, width=DEFAULT_VIDEO_WIDTH, height=DEFAULT_VIDEO_HEIGHT):
+    # NOTE: the video directory is expected to be created by the caller
     video_directory_path = os.path.join(videos_directory_path, id)
-
-    os.makedirs(video_directory_path, exist_ok=True)
+    
+    # NOTE: tests only check shapes, so a single random frame is encoded once and reused for every frame
+    frame = np.random.randint(0, 255, (height, width, DEFAULT_VIDEO_NUMBER_OF_CHANNELS), dtype=np.uint8)
+    
+    # NOTE: cv2 expects BGR frames and its libjpeg-turbo encoder is much faster than PIL's
+    _, buffer = cv2.imencode(".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+    buffer = buffer.tobytes()
+    
+    image_path_prefix = os.path.join(video_directory_path, "img_")
     
     for i in range(number_of_frames):
-        frame = np.random.randint(0, 255, (height, width, DEFAULT_VIDEO_NUMBER_OF_CHANNELS), dtype=np.uint8)
-        
-        image = Image.fromarray(frame)
-        
-        image_file_name = f"img_{(i + 1):05d}.jpg"
-        
-        image_path = os.path.join(video_directory_path, image_file_name)
-        
-        image.save(image_path)
+        with open(f"{image_path_prefix}{(i + 1):05d}.jpg", "wb") as file:
+            file.write(buffer)
         
     return video_directory_path
 
@@ -59,22 +71,22 @@ def create_segment_level_annotations_csv_file(annotations_directory_path, id, nu
     return annotations_file_path
 
 def create_complete_video(videos_directory_path, id, number_of_frames, width=DEFAULT_VIDEO_WIDTH, height=DEFAULT_VIDEO_HEIGHT):
+    # NOTE: the video directory is expected to be created by the caller
     video_directory_path = os.path.join(videos_directory_path, id)
-    os.makedirs(video_directory_path, exist_ok=True)
     
     video_path = os.path.join(video_directory_path, f"{id}.mp4")
     
-    # NOTE: create video frames
-    frames = [np.random.randint(0, 255, (height, width, DEFAULT_VIDEO_NUMBER_OF_CHANNELS), dtype=np.uint8) 
-              for _ in range(number_of_frames)]
+    # NOTE: create a single video frame, reused for every frame of the video
+    frame = np.random.randint(0, 255, (height, width, DEFAULT_VIDEO_NUMBER_OF_CHANNELS), dtype=np.uint8)
+    # NOTE: RGB to BGR is a plain channel reversal, the writer requires a contiguous buffer
+    frame = np.ascontiguousarray(frame[..., ::-1])
     
-    # NOTE: convert frames to video using OpenCV
-    import cv2
+    # NOTE: convert frames to video using OpenCV, the ffmpeg backend is selected explicitly to avoid backend probing
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video_writer = cv2.VideoWriter(video_path, fourcc, DEFAUlT_VIDEO_FPS, (width, height))
+    video_writer = cv2.VideoWriter(video_path, cv2.CAP_FFMPEG, fourcc, DEFAUlT_VIDEO_FPS, (width, height), True)
     
-    for frame in frames:
-        video_writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    for _ in range(number_of_frames):
+        video_writer.write(frame)
     
     video_writer.release()
     
@@ -89,6 +101,18 @@ def create_frame_level_annotations_txt_file(annotations_directory_path, id, numb
     
     return annotations_file_path
 
+def link_annotations_file(canonical_annotations_file_path, annotations_directory_path, id):
+    extension = os.path.splitext(canonical_annotations_file_path)[1]
+    annotations_file_path = os.path.join(annotations_directory_path, f"{id}{extension}")
+    
+    try:
+        os.symlink(canonical_annotations_file_path, annotations_file_path)
+    except (OSError, NotImplementedError):
+        # NOTE: symlinks may require extra privileges on windows
+        shutil.copyfile(canonical_annotations_file_path, annotations_file_path)
+    
+    return annotations_file_path
+
 class AnnotationType(IntEnum):
     TXT_FRAME_LEVEL = 0
     CSV_SEGMENT_LEVEL = 1
@@ -103,8 +127,13 @@ def setup_test_data(
     number_of_frames_variance,
     with_ids_file=False,
     annotations_type: AnnotationType = AnnotationType.TXT_FRAME_LEVEL,
-    video_type: VideoType = VideoType.FRAME_LEVEL
+    video_type: VideoType = VideoType.FRAME_LEVEL,
+    share_annotations_file=False
 ) -> Tuple[DatasetConfiguration, tempfile.TemporaryDirectory]:
+    """
+    When share_annotations_file is True, a single annotations file long enough for the longest video is written and linked for every id.
+    Only use it for tests that do not inspect the annotations values.
+    """
     temporary_directory = tempfile.TemporaryDirectory()
     
     videos_directory_path = os.path.join(temporary_directory.name, "videos")
@@ -114,6 +143,16 @@ def setup_test_data(
     os.makedirs(annotations_directory_path, exist_ok=True)
     
     ids = []
+    
+    canonical_annotations_file_path = None
+    
+    if share_annotations_file:
+        maximum_number_of_frames = int(number_of_frames + number_of_frames_variance * number_of_frames)
+        
+        if annotations_type == AnnotationType.CSV_SEGMENT_LEVEL:
+            canonical_annotations_file_path = create_segment_level_annotations_csv_file(temporary_directory.name, "canonical", maximum_number_of_frames // 10)
+        elif annotations_type == AnnotationType.TXT_FRAME_LEVEL:
+            canonical_annotations_file_path = create_frame_level_annotations_txt_file(temporary_directory.name, "canonical", maximum_number_of_frames)
 
     for i in range(number_of_samples):
         id = f"video_{i}"
@@ -123,12 +162,16 @@ def setup_test_data(
             number_of_frames_variance * number_of_frames
         ))
         
+        os.makedirs(os.path.join(videos_directory_path, id))
+        
         if video_type == VideoType.FRAME_LEVEL:
             create_frame_level_video(videos_directory_path, id, number_of_frames_)
         elif video_type == VideoType.COMPLETE_VIDEO:
             create_complete_video(videos_directory_path, id, number_of_frames_)
         
-        if annotations_type == AnnotationType.CSV_SEGMENT_LEVEL:
+        if canonical_annotations_file_path is not None:
+            link_annotations_file(canonical_annotations_file_path, annotations_directory_path, id)
+        elif annotations_type == AnnotationType.CSV_SEGMENT_LEVEL:
             create_segment_level_annotations_csv_file(annotations_directory_path, id, number_of_frames_ // 10)
         elif annotations_type == AnnotationType.TXT_FRAME_LEVEL:
             create_frame_level_annotations_txt_file(annotations_directory_path, id, number_of_frames_)
@@ -139,8 +182,7 @@ def setup_test_data(
     
     if with_ids_file:
         with open(ids_file_path, "w") as file:
-            for id in ids:
-                file.write(f"{id}\n")
+            file.write("\n".join(ids) + "\n")
     
     # NOTE: return the temporary directory to ensure cleanup
     return DatasetConfiguration(
@@ -149,24 +191,74 @@ def setup_test_data(
         ids_file_path=ids_file_path,
     ), temporary_directory
 
-@pytest.fixture
+# NOTE: the generated data is only read by the tests, so it is shared across the whole session
+@pytest.fixture(scope="session")
 def setup_small_test_data():
     dataset_configuration, temporary_directory = setup_test_data(
         number_of_samples=8,
         number_of_frames=32,
-        number_of_frames_variance=0.1
+        number_of_frames_variance=0.1,
+        share_annotations_file=True
     )
     
     yield dataset_configuration, temporary_directory
 
     temporary_directory.cleanup()
     
-def initialize_dataset_from_configuration(dataset_configuration: DatasetConfiguration, segment_size: int):
+class FakeVideoProcessor(Video):
+    """
+    In memory video returning black frames, used by tests that only check shapes and counts.
+    """
+    
+    def __init__(self, videos_dir_path, id, number_of_frames=DEFAULT_FAKE_VIDEO_NUMBER_OF_FRAMES):
+        self.id = id
+        self.number_of_frames = number_of_frames
+        
+    def get_id(self):
+        return self.id
+    
+    def __len__(self):
+        return self.number_of_frames
+    
+    def __getitem__(self, index: int | slice):
+        if isinstance(index, int):
+            index = slice(index, index + 1)
+        
+        number_of_frames = len(range(*index.indices(self.number_of_frames)))
+        
+        return np.zeros((number_of_frames, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS), dtype=np.uint8)
+    
+class FakeAnnotationsProcessor(Annotations):
+    """
+    In memory annotations returning a constant label, used by tests that only check shapes and counts.
+    """
+    
+    def __init__(self, annotations_dir_path, id, label=0, number_of_annotations=DEFAULT_FAKE_VIDEO_NUMBER_OF_FRAMES):
+        self.id = id
+        self.label = label
+        self.number_of_annotations = number_of_annotations
+        
+    def get_id(self):
+        return self.id
+    
+    def __len__(self):
+        return self.number_of_annotations
+    
+    def __getitem__(self, index: int | slice):
+        if isinstance(index, int):
+            return self.label
+        
+        return [self.label] * len(range(*index.indices(self.number_of_annotations)))
+    
+def initialize_dataset_from_configuration(dataset_configuration: DatasetConfiguration, segment_size: int, fast: bool = False):
+    """
+    When fast is True, in memory processors are used instead of reading the frames and annotations from disk.
+    """
     return VideoDataset(
         annotations_dir=dataset_configuration.annotations_directory_path,
         videos_dir=dataset_configuration.videos_directory_path,
-        video_processor=VideoFromVideoFramesDirectory,
-        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        video_processor=FakeVideoProcessor if fast else VideoFromVideoFramesDirectory,
+        annotations_processor=FakeAnnotationsProcessor if fast else AnnotationsFromFrameLevelTxtFileAnnotations,
         ids_file=dataset_configuration.ids_file_path,
         segment_size=segment_size
     )
\ No newline at end of file
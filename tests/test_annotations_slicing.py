@@ -0,0 +1,94 @@
+import os
+import pytest
+import tempfile
+
+from video_dataset.annotations import AnnotationsFromFrameLevelTxtFileAnnotations, AnnotationsFromSegmentLevelCsvFileAnnotations, FALLBACK_ANNOTATION
+
+NUMBER_OF_FRAMES = 10
+
+@pytest.fixture
+def setup_txt_annotations():
+    temporary_directory = tempfile.TemporaryDirectory()
+
+    with open(os.path.join(temporary_directory.name, "video_0.txt"), "w") as file:
+        for i in range(NUMBER_OF_FRAMES):
+            file.write(f"label_{i}\n")
+
+    yield AnnotationsFromFrameLevelTxtFileAnnotations(temporary_directory.name, "video_0")
+
+    temporary_directory.cleanup()
+
+@pytest.fixture
+def setup_csv_annotations():
+    temporary_directory = tempfile.TemporaryDirectory()
+
+    with open(os.path.join(temporary_directory.name, "video_0.csv"), "w") as file:
+        file.write("starting-timestamp;ending-timestamp;action\n")
+        # NOTE: at 1000 fps timestamps are frame numbers, frames 4 and 5 are left without annotation.
+        file.write("0;3;walk\n")
+        file.write("6;9;run\n")
+
+    yield AnnotationsFromSegmentLevelCsvFileAnnotations(temporary_directory.name, "video_0", fps=1000)
+
+    temporary_directory.cleanup()
+
+def test_csv_annotations_expansion(setup_csv_annotations):
+    annotations = setup_csv_annotations
+
+    assert len(annotations) == NUMBER_OF_FRAMES
+    assert annotations[0:12] == ["walk"] * 4 + [FALLBACK_ANNOTATION] * 2 + ["run"] * 4 + [FALLBACK_ANNOTATION] * 2
+    assert annotations[0:12:3] == ["walk", "walk", "run", "run"]
+
+@pytest.mark.parametrize("start,stop,step", [
+    (0, 8, 1),
+    (4, 16, 1),
+    (12, 16, 1),
+    (0, 16, 3),
+    (8, 4, 1),
+    (3, 16, 4),
+    (9, 2, -2),
+    (15, 2, -3),
+])
+def test_txt_annotations_slicing(setup_txt_annotations, start, stop, step):
+    annotations = setup_txt_annotations
+
+    expected = [f"label_{i}" if i < NUMBER_OF_FRAMES else FALLBACK_ANNOTATION for i in range(start, stop, step)]
+
+    assert len(annotations) == NUMBER_OF_FRAMES
+    assert annotations[start:stop:step] == expected
+
+def write_csv_annotations(annotations_directory_path, segments):
+    with open(os.path.join(annotations_directory_path, "video_0.csv"), "w") as file:
+        file.write("starting-timestamp;ending-timestamp;action\n")
+        for start, end, action in segments:
+            file.write(f"{start};{end};{action}\n")
+
+def test_csv_annotations_shared_boundary():
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        write_csv_annotations(temporary_directory, [(0, 1000, "walk"), (1000, 2000, "run"), (2000, 3000, "jump")])
+        
+        annotations = AnnotationsFromSegmentLevelCsvFileAnnotations(temporary_directory, "video_0", fps=8)
+        
+        # NOTE: every segment spans frames 8 * k to 8 * (k + 1) inclusive, the boundary frame is annotated by both segments.
+        assert len(annotations) == 27
+        assert annotations[0:27] == ["walk"] * 9 + ["run"] * 9 + ["jump"] * 9
+
+def test_csv_annotations_overlapping_segments():
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        write_csv_annotations(temporary_directory, [(0, 1000, "walk"), (500, 1500, "run")])
+        
+        annotations = AnnotationsFromSegmentLevelCsvFileAnnotations(temporary_directory, "video_0", fps=8)
+        
+        # NOTE: segments are appended one after the other, the overlap is not merged.
+        assert len(annotations) == 18
+        assert annotations[0:18] == ["walk"] * 9 + ["run"] * 9
+
+def test_csv_annotations_out_of_order_segments():
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        write_csv_annotations(temporary_directory, [(1500, 2000, "run"), (0, 1000, "walk")])
+        
+        annotations = AnnotationsFromSegmentLevelCsvFileAnnotations(temporary_directory, "video_0", fps=8)
+        
+        # NOTE: segments are appended in file order, the gap before the first one is filled with the fallback annotation.
+        assert len(annotations) == 26
+        assert annotations[0:26] == [FALLBACK_ANNOTATION] * 12 + ["run"] * 5 + ["walk"] * 9
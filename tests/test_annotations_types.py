@@ -2,11 +2,11 @@ import pytest
 
 from video_dataset import VideoDataset
 from video_dataset.video import VideoFromVideoFramesDirectory
-from video_dataset.annotations import AnnotationsFromSegmentLevelCsvFileAnnotations, AnnotationsFromFrameLevelTxtFileAnnotations
+from video_dataset.annotations import AnnotationsFromSegmentLevelCsvFileAnnotations, AnnotationsFromFrameLevelTxtFileAnnotations, UndefinedAnnotationsException
 
 from tests.helpers import setup_test_data, VideoType, AnnotationType, DEFAUlT_VIDEO_FPS, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def setup_csv_annotations_dataset():
     dataset_configuration, temporary_directory = setup_test_data(
         number_of_samples=8,
@@ -20,7 +20,7 @@ def setup_csv_annotations_dataset():
 
     temporary_directory.cleanup()
     
-@pytest.fixture
+@pytest.fixture(scope="session")
 def setup_txt_annotations_dataset():
     dataset_configuration, temporary_directory = setup_test_data(
         number_of_samples=8,
@@ -37,7 +37,7 @@ def setup_txt_annotations_dataset():
 def test_csv_annotations(setup_csv_annotations_dataset):
     segment_size = 8
     
-    dataset_configuration, temporary_directory = setup_csv_annotations_dataset
+    dataset_configuration, _ = setup_csv_annotations_dataset
     
     dataset = VideoDataset(
         annotations_dir=dataset_configuration.annotations_directory_path,
@@ -56,13 +56,11 @@ def test_csv_annotations(setup_csv_annotations_dataset):
         
         assert video.shape == (segment_size, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
         assert len(annotations) == segment_size
-        
-    temporary_directory.cleanup()
 
 def test_txt_annotations(setup_txt_annotations_dataset):
     segment_size = 8
     
-    dataset_configuration, temporary_directory = setup_txt_annotations_dataset
+    dataset_configuration, _ = setup_txt_annotations_dataset
     
     dataset = VideoDataset(
         annotations_dir=dataset_configuration.annotations_directory_path,
@@ -78,5 +76,13 @@ def test_txt_annotations(setup_txt_annotations_dataset):
         
         assert video.shape == (segment_size, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
         assert len(annotations) == segment_size
-        
-    temporary_directory.cleanup()
\ No newline at end of file
+
+@pytest.mark.parametrize("annotations_class,annotations_kwargs", [
+    (AnnotationsFromFrameLevelTxtFileAnnotations, {}),
+    (AnnotationsFromSegmentLevelCsvFileAnnotations, {'fps': DEFAUlT_VIDEO_FPS}),
+])
+def test_missing_annotations_file(setup_txt_annotations_dataset, annotations_class, annotations_kwargs):
+    dataset_configuration, _ = setup_txt_annotations_dataset
+    
+    with pytest.raises(UndefinedAnnotationsException):
+        annotations_class(dataset_configuration.annotations_directory_path, "missing_video", **annotations_kwargs)
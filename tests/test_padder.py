@@ -21,6 +21,9 @@ def test_padder(padder_class, frames_padding_value, annotations_padding_value, e
 
     padded_frames, padded_annotations = padder(frames, annotations, target_segment_size)
 
+    assert padded_frames.shape == (target_segment_size, *frames.shape[1:]), "Padded frames shape incorrect!"
+    assert np.array_equal(padded_frames[:original_segment_size], frames), "Original frames not preserved!"
+
     if padder_class == ValuePadder:
         assert np.all(padded_frames[original_segment_size:] == frames_padding_value), "ValuePadder frames padding incorrect!"
         assert padded_annotations[original_segment_size:] == [annotations_padding_value] * (target_segment_size - original_segment_size), "ValuePadder annotations padding incorrect!"
@@ -0,0 +1,48 @@
+import pytest
+
+from tests.helpers import setup_small_test_data, initialize_dataset_from_configuration
+
+from video_dataset.prefetch import PrefetchedVideoDataset
+
+@pytest.mark.parametrize("number_of_threads,prefetch_size", [
+    (1, None),
+    (4, None),
+    (4, 1),
+])
+def test_prefetched_dataset_iteration(setup_small_test_data, number_of_threads, prefetch_size):
+    dataset_configuration, _ = setup_small_test_data
+    
+    dataset = initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=8)
+    
+    prefetched_dataset = PrefetchedVideoDataset(dataset, number_of_threads=number_of_threads, prefetch_size=prefetch_size)
+    
+    assert len(prefetched_dataset) == len(dataset)
+    
+    samples = list(prefetched_dataset)
+    
+    assert len(samples) == len(dataset)
+    
+    for index, (frames, labels) in enumerate(samples):
+        expected_frames, expected_labels = dataset[index]
+        
+        assert (frames == expected_frames).all()
+        assert labels == expected_labels
+
+def test_prefetched_dataset_indices_and_early_stop(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    dataset = initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=8)
+    
+    indices = [5, 0, len(dataset) - 1, 3]
+    
+    prefetched_dataset = PrefetchedVideoDataset(dataset, indices=indices, number_of_threads=2)
+    
+    for index, (frames, labels) in zip(indices, prefetched_dataset):
+        expected_frames, expected_labels = dataset[index]
+        
+        assert (frames == expected_frames).all()
+        assert labels == expected_labels
+        
+    # NOTE: stopping early must not hang on the samples still being loaded
+    for _ in PrefetchedVideoDataset(dataset, number_of_threads=2):
+        break
\ No newline at end of file
@@ -0,0 +1,22 @@
+import os
+import pytest
+
+from video_dataset.utils import read_file_into_thread_buffer
+
+def test_read_file_into_thread_buffer(tmp_path):
+    paths = []
+    
+    for i, size in enumerate([16, 4, 64, 0]):
+        path = os.path.join(str(tmp_path), f"file_{i}.bin")
+        
+        with open(path, "wb") as file:
+            file.write(bytes(range(size)))
+            
+        paths.append(path)
+        
+    for path in paths:
+        with open(path, "rb") as file:
+            assert bytes(read_file_into_thread_buffer(path)) == file.read()
+            
+    with pytest.raises(FileNotFoundError):
+        read_file_into_thread_buffer(os.path.join(str(tmp_path), "missing.bin"))
\ No newline at end of file
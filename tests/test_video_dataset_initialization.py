@@ -1,17 +1,36 @@
+import os
+import pickle
 import pytest
+import importlib.util
 
-from tests.helpers import setup_small_test_data, initialize_dataset_from_configuration
+from pydantic import ValidationError
+
+from tests.helpers import setup_small_test_data, initialize_dataset_from_configuration, create_frame_level_annotations_txt_file, is_cuda_available
 from tests.helpers import DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS
 
-from video_dataset.video import VideoFromVideoFramesDirectory
-from video_dataset.dataset import VideoDataset, DEFAULT_VIDEO_SHAPE
+from video_dataset.video import VideoFromVideoFramesDirectory, VideoFromVideoFramesDirectoryDecodedOnGPU
+from video_dataset.dataset import VideoDataset, VideoDatasetConfig, VideoShapeComponents
+from video_dataset.utils import get_ids_from_directory
 from video_dataset.annotations import AnnotationsFromFrameLevelTxtFileAnnotations
+
+# NOTE: more than the number of frames of any video of the small test data
+OVERLAPPING_SEGMENTS_NUMBER_OF_ANNOTATIONS = 64
  
 def test_initialization(setup_small_test_data):
     dataset_configuration, _ = setup_small_test_data
 
     dataset = initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=12)
 
+def test_fast_initialization(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 12
+    
+    dataset = initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=segment_size, fast=True)
+    
+    # NOTE: every in memory video has the same number of frames
+    assert len(dataset) == len(dataset.ids) * (len(dataset.videos[0]) // segment_size)
+
 def test_video_sample_retrieval(setup_small_test_data):
     dataset_configuration, _ = setup_small_test_data
     
@@ -22,4 +41,404 @@ def test_video_sample_retrieval(setup_small_test_data):
     frames, labels = dataset[10]
     
     assert frames.shape == (segment_size, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
-    assert len(labels) == segment_size
\ No newline at end of file
+    assert len(labels) == segment_size
+
+def test_fast_video_sample_retrieval(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 8
+    
+    dataset = initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=segment_size, fast=True)
+    
+    for i in range(len(dataset)):
+        frames, labels = dataset[i]
+        
+        assert frames.shape == (segment_size, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
+        assert len(labels) == segment_size
+
+
+def test_overlapping_segments(setup_small_test_data, tmp_path):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 8
+    overlap = 4
+    
+    # NOTE: dedicated annotations, as the values of the shared annotations file must not be relied on
+    for id in get_ids_from_directory(dataset_configuration.videos_directory_path):
+        create_frame_level_annotations_txt_file(str(tmp_path), id, OVERLAPPING_SEGMENTS_NUMBER_OF_ANNOTATIONS)
+    
+    dataset = VideoDataset(
+        annotations_dir=str(tmp_path),
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=segment_size,
+        overlap=overlap
+    )
+    
+    assert len(dataset) == sum((video_length - overlap) // (segment_size - overlap) for video_length in dataset.videos_lengths)
+    
+    # NOTE: each txt annotation line starts with its frame number
+    _, first_labels = dataset[0]
+    _, second_labels = dataset[1]
+    
+    assert first_labels[0].startswith(f"{1:05d}")
+    assert second_labels[0].startswith(f"{(segment_size - overlap) + 1:05d}")
+    
+    frames, labels = dataset[len(dataset) - 1]
+    
+    assert frames.shape == (segment_size, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
+    assert len(labels) == segment_size
+
+def test_overlap_must_be_smaller_than_segment_size(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    with pytest.raises(ValidationError):
+        VideoDataset(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            overlap=8
+        )
+
+
+def test_batched_video_sample_retrieval(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    dataset = initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=8)
+    
+    indices = [len(dataset) - 1, 0, 5, 5]
+    
+    samples = dataset.__getitems__(indices)
+    
+    assert len(samples) == len(indices)
+    
+    for index, (frames, labels) in zip(indices, samples):
+        expected_frames, expected_labels = dataset[index]
+        
+        assert (frames == expected_frames).all()
+        assert labels == expected_labels
+    
+    with pytest.raises(ValueError):
+        dataset.__getitems__([len(dataset)])
+
+
+def test_videos_lengths_cache_file(setup_small_test_data, tmp_path):
+    dataset_configuration, _ = setup_small_test_data
+    
+    videos_lengths_cache_file = os.path.join(tmp_path, "videos-lengths.json")
+    
+    def initialize_dataset():
+        return VideoDataset(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            videos_lengths_cache_file=videos_lengths_cache_file
+        )
+    
+    first_dataset = initialize_dataset()
+    
+    assert os.path.exists(videos_lengths_cache_file)
+    
+    second_dataset = initialize_dataset()
+    
+    # NOTE: lengths are served from the cache file, so no video processor had to be instantiated
+    assert not any(second_dataset.videos.is_loaded(index) for index in range(len(second_dataset.videos)))
+    assert (second_dataset.videos_lengths == first_dataset.videos_lengths).all()
+    assert len(second_dataset) == len(first_dataset)
+    
+    frames, labels = second_dataset[0]
+    
+    assert frames.shape == (8, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
+
+def test_videos_lengths_cache_file_depends_on_video_processor_kwargs(setup_small_test_data, tmp_path):
+    dataset_configuration, _ = setup_small_test_data
+    
+    videos_lengths_cache_file = os.path.join(tmp_path, "videos-lengths.json")
+    
+    def initialize_dataset(starting_index):
+        return VideoDataset(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            video_processor_kwargs={ "starting_index": starting_index },
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            videos_lengths_cache_file=videos_lengths_cache_file
+        )
+    
+    first_dataset = initialize_dataset(starting_index=1)
+    second_dataset = initialize_dataset(starting_index=9)
+    
+    # NOTE: the lengths cached for starting_index=1 must not be reused, frames numbered before 9 are skipped
+    assert (second_dataset.videos_lengths == first_dataset.videos_lengths - 8).all()
+    assert (second_dataset.videos_lengths == [len(second_dataset.videos[index]) for index in range(len(second_dataset.videos))]).all()
+    
+    frames, _ = second_dataset[len(second_dataset) - 1]
+    
+    assert frames.shape == (8, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
+
+
+def test_initialization_from_config(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 8
+    
+    configuration = VideoDatasetConfig(
+        annotations_dir=dataset_configuration.annotations_directory_path,
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=segment_size
+    )
+    
+    dataset = VideoDataset.from_config(configuration)
+    
+    assert len(dataset) == len(initialize_dataset_from_configuration(dataset_configuration=dataset_configuration, segment_size=segment_size))
+    
+    frames, labels = dataset[0]
+    
+    assert frames.shape == (segment_size, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
+    assert len(labels) == segment_size
+
+
+@pytest.mark.parametrize("contiguous_frames", [False, True])
+def test_custom_video_shape(setup_small_test_data, contiguous_frames):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 8
+    
+    dataset = VideoDataset(
+        annotations_dir=dataset_configuration.annotations_directory_path,
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=segment_size,
+        video_shape=(VideoShapeComponents.TIME, VideoShapeComponents.CHANNELS, VideoShapeComponents.HEIGHT, VideoShapeComponents.WIDTH),
+        contiguous_frames=contiguous_frames
+    )
+    
+    frames, _ = dataset[0]
+    
+    assert frames.shape == (segment_size, DEFAULT_VIDEO_NUMBER_OF_CHANNELS, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH)
+    
+    if contiguous_frames:
+        assert frames.flags["C_CONTIGUOUS"]
+
+
+def test_prefetch_next_segment(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 8
+    
+    def initialize_dataset(prefetch_next_segment):
+        return VideoDataset(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=segment_size,
+            prefetch_next_segment=prefetch_next_segment
+        )
+    
+    dataset = initialize_dataset(prefetch_next_segment=False)
+    prefetching_dataset = initialize_dataset(prefetch_next_segment=True)
+    
+    # NOTE: sequential accesses are served from the prefetched segment, random ones are loaded directly
+    for index in list(range(len(dataset))) + [3, 0, len(dataset) - 1]:
+        frames, labels = dataset[index]
+        prefetched_frames, prefetched_labels = prefetching_dataset[index]
+        
+        assert (frames == prefetched_frames).all()
+        assert labels == prefetched_labels
+
+
+def test_reuse_frames_buffer(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    segment_size = 8
+    
+    def initialize_dataset(reuse_frames_buffer):
+        return VideoDataset(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=segment_size,
+            reuse_frames_buffer=reuse_frames_buffer
+        )
+        
+    dataset = initialize_dataset(reuse_frames_buffer=False)
+    reusing_dataset = initialize_dataset(reuse_frames_buffer=True)
+    
+    first_frames, _ = reusing_dataset[0]
+    second_frames, _ = reusing_dataset[1]
+    
+    assert second_frames.base is first_frames or second_frames is first_frames
+    
+    for index in range(len(dataset)):
+        frames, _ = dataset[index]
+        reused_frames, _ = reusing_dataset[index]
+        
+        assert (frames == reused_frames).all()
+
+
+def test_max_loaded_videos(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    max_loaded_videos = 2
+    
+    dataset = VideoDataset(
+        annotations_dir=dataset_configuration.annotations_directory_path,
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=8,
+        max_loaded_videos=max_loaded_videos
+    )
+    
+    for index in range(len(dataset)):
+        dataset[index]
+        
+    assert sum(dataset.videos.is_loaded(index) for index in range(len(dataset.videos))) <= max_loaded_videos
+
+
+def test_compile_transforms_keeps_plain_callables(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    def frames_transform(frames):
+        return frames[:, :, :, 0]
+    
+    dataset = VideoDataset(
+        annotations_dir=dataset_configuration.annotations_directory_path,
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=8,
+        frames_transform=frames_transform,
+        compile_transforms=True
+    )
+    
+    assert dataset.frames_transform is frames_transform
+    
+    frames, _ = dataset[0]
+    
+    assert frames.shape == (8, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH)
+
+
+def test_pickled_dataset_reloads_videos_lazily(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    dataset = VideoDataset(
+        annotations_dir=dataset_configuration.annotations_directory_path,
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=8,
+        max_loaded_videos=2,
+        prefetch_next_segment=True
+    )
+    
+    frames, labels = dataset[0]
+    
+    unpickled_dataset = pickle.loads(pickle.dumps(dataset))
+    
+    assert len(unpickled_dataset) == len(dataset)
+    assert not any(unpickled_dataset.videos.is_loaded(index) for index in range(len(unpickled_dataset.videos)))
+    
+    unpickled_frames, unpickled_labels = unpickled_dataset[0]
+    
+    assert (frames == unpickled_frames).all()
+    assert labels == unpickled_labels
+
+
+@pytest.mark.skipif(importlib.util.find_spec("torch") is None, reason="torch is not installed")
+def test_frames_as_tensor(setup_small_test_data):
+    import torch
+    
+    dataset_configuration, _ = setup_small_test_data
+    
+    dataset = VideoDataset(
+        annotations_dir=dataset_configuration.annotations_directory_path,
+        videos_dir=dataset_configuration.videos_directory_path,
+        video_processor=VideoFromVideoFramesDirectory,
+        annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+        segment_size=8,
+        frames_as_tensor=True
+    )
+    
+    frames, _ = dataset[0]
+    
+    assert isinstance(frames, torch.Tensor)
+    assert frames.dtype == torch.uint8
+    assert tuple(frames.shape) == (8, DEFAULT_VIDEO_HEIGHT, DEFAULT_VIDEO_WIDTH, DEFAULT_VIDEO_NUMBER_OF_CHANNELS)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("torch") is not None, reason="torch is installed")
+def test_frames_as_tensor_requires_torch(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    with pytest.raises(ValidationError):
+        VideoDatasetConfig(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            frames_as_tensor=True
+        )
+
+
+def test_pin_frames_buffer_requires_reuse_frames_buffer(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    with pytest.raises(ValidationError):
+        VideoDatasetConfig(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            pin_frames_buffer=True
+        )
+
+
+@pytest.mark.skipif(is_cuda_available(), reason="a CUDA device is available")
+def test_pin_frames_buffer_requires_cuda(setup_small_test_data):
+    dataset_configuration, _ = setup_small_test_data
+    
+    with pytest.raises(ValidationError):
+        VideoDatasetConfig(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectory,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            reuse_frames_buffer=True,
+            pin_frames_buffer=True
+        )
+
+
+@pytest.mark.parametrize("option", [
+    { "video_shape": (VideoShapeComponents.CHANNELS, VideoShapeComponents.TIME, VideoShapeComponents.HEIGHT, VideoShapeComponents.WIDTH) },
+    { "padder": lambda frames, annotations, target_segment_size: (frames, annotations) },
+    { "contiguous_frames": True },
+    { "frames_as_tensor": True },
+    { "reuse_frames_buffer": True },
+])
+def test_frames_decoded_on_gpu_reject_numpy_options(setup_small_test_data, option):
+    dataset_configuration, _ = setup_small_test_data
+    
+    with pytest.raises(ValidationError):
+        VideoDatasetConfig(
+            annotations_dir=dataset_configuration.annotations_directory_path,
+            videos_dir=dataset_configuration.videos_directory_path,
+            video_processor=VideoFromVideoFramesDirectoryDecodedOnGPU,
+            annotations_processor=AnnotationsFromFrameLevelTxtFileAnnotations,
+            segment_size=8,
+            **option
+        )
\ No newline at end of file
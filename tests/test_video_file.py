@@ -0,0 +1,122 @@
+import os
+import cv2
+import pickle
+import pytest
+import tempfile
+import importlib.util
+
+import numpy as np
+
+from video_dataset.video import VideoFromVideoFile, VideoFromVideoFileWithPyAV, HWAccel
+
+NUMBER_OF_FRAMES = 24
+FRAME_VALUE_STEP = 10
+# NOTE: frames are lossy encoded, their decoded values are only close to the written ones
+FRAME_VALUE_TOLERANCE = FRAME_VALUE_STEP // 2
+
+VIDEO_PROCESSORS = [
+    VideoFromVideoFile,
+    pytest.param(VideoFromVideoFileWithPyAV, marks=pytest.mark.skipif(importlib.util.find_spec("av") is None, reason="PyAV is not installed")),
+]
+
+@pytest.fixture(scope="module")
+def setup_video_file():
+    temporary_directory = tempfile.TemporaryDirectory()
+    
+    # NOTE: every frame has a uniform value depending on its index, so that the decoded frames can be identified
+    video_writer = cv2.VideoWriter(os.path.join(temporary_directory.name, "video_0.mp4"), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), 8, (16, 16), True)
+    
+    for i in range(NUMBER_OF_FRAMES):
+        video_writer.write(np.full((16, 16, 3), i * FRAME_VALUE_STEP, dtype=np.uint8))
+        
+    video_writer.release()
+    
+    yield temporary_directory.name
+    
+    temporary_directory.cleanup()
+    
+def assert_frames_match_indices(frames, indices):
+    assert frames.shape == (len(indices), 16, 16, 3)
+    assert np.all(np.abs(frames.mean(axis=(1, 2, 3)) - np.asarray(indices) * FRAME_VALUE_STEP) <= FRAME_VALUE_TOLERANCE)
+
+@pytest.mark.parametrize("video_processor", VIDEO_PROCESSORS)
+@pytest.mark.parametrize("start,stop,step", [
+    (0, 8, 1),
+    (8, 16, 1),
+    (18, 24, 1),
+    (4, 12, 1),
+    (0, 24, 3),
+    (20, 2, -4),
+])
+def test_video_file_slicing(setup_video_file, video_processor, start, stop, step):
+    video = video_processor(setup_video_file, "video_0")
+    
+    assert len(video) == NUMBER_OF_FRAMES
+    assert_frames_match_indices(video[start:stop:step], list(range(start, stop, step)))
+    assert_frames_match_indices(video.get_frames(start, stop, step), list(range(start, stop, step)))
+
+@pytest.mark.parametrize("video_processor", VIDEO_PROCESSORS)
+def test_video_file_sequential_and_random_access(setup_video_file, video_processor):
+    video = video_processor(setup_video_file, "video_0")
+    
+    # NOTE: mixes reads continuing the previous one, short forward jumps and backward seeks on the same capture
+    for start in [0, 8, 16, 22, 2, 14, 6]:
+        assert_frames_match_indices(video[start:start + 4], list(range(start, min(start + 4, NUMBER_OF_FRAMES))))
+        
+    assert abs(video[5].mean() - 5 * FRAME_VALUE_STEP) <= FRAME_VALUE_TOLERANCE
+    
+    unpickled_video = pickle.loads(pickle.dumps(video))
+    
+    assert_frames_match_indices(unpickled_video[12:16], list(range(12, 16)))
+    
+    video.close()
+    
+    assert_frames_match_indices(video[12:16], list(range(12, 16)))
+    
+@pytest.mark.parametrize("video_processor", VIDEO_PROCESSORS)
+def test_video_file_read_into(setup_video_file, video_processor):
+    video = video_processor(setup_video_file, "video_0")
+    
+    out = np.zeros((8, 16, 16, 3), dtype=np.uint8)
+    
+    assert video.read_into(4, 12, 2, out) == 4
+    assert_frames_match_indices(out[:4], [4, 6, 8, 10])
+    
+    with pytest.raises(ValueError):
+        video.read_into(0, 8, 1, np.zeros((8, 8, 8, 3), dtype=np.uint8))
+    
+def test_video_file_hardware_acceleration(setup_video_file):
+    # NOTE: decoding falls back to the cpu when no hardware decoder is available
+    video = VideoFromVideoFile(setup_video_file, "video_0", hardware_acceleration="any")
+    
+    assert_frames_match_indices(video[0:8:2], [0, 2, 4, 6])
+    
+    with pytest.raises(ValueError):
+        VideoFromVideoFile(setup_video_file, "video_0", hardware_acceleration="unknown")
+
+@pytest.mark.skipif(HWAccel is None, reason="PyAV is not installed or does not support hardware acceleration")
+def test_video_file_with_pyav_hardware_acceleration(setup_video_file):
+    from av.codec.hwaccel import hwdevices_available
+    
+    if len(hwdevices_available()) == 0:
+        pytest.skip("FFmpeg was built without hardware devices")
+    
+    # NOTE: decoding falls back to the cpu when the device can't be used
+    video = VideoFromVideoFileWithPyAV(setup_video_file, "video_0", hardware_acceleration=hwdevices_available()[0])
+    
+    assert_frames_match_indices(video[0:8:2], [0, 2, 4, 6])
+    
+    with pytest.raises(ValueError):
+        VideoFromVideoFileWithPyAV(setup_video_file, "video_0", hardware_acceleration="unknown")
+
+@pytest.mark.skipif(importlib.util.find_spec("av") is None, reason="PyAV is not installed")
+def test_video_file_probe_with_pyav(setup_video_file):
+    video = VideoFromVideoFile(setup_video_file, "video_0", probe_with_pyav=True)
+    
+    assert len(video) == len(VideoFromVideoFile(setup_video_file, "video_0"))
+    assert_frames_match_indices(video[0:8:2], [0, 2, 4, 6])
+
+@pytest.mark.skipif(importlib.util.find_spec("av") is not None, reason="PyAV is installed")
+def test_video_file_probe_with_pyav_requires_pyav(setup_video_file):
+    with pytest.raises(ImportError):
+        VideoFromVideoFile(setup_video_file, "video_0", probe_with_pyav=True)
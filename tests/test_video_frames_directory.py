@@ -0,0 +1,192 @@
+import os
+import cv2
+import pytest
+import tempfile
+import importlib.util
+
+import numpy as np
+
+from video_dataset.video import VideoFromVideoFramesDirectory, VideoFromVideoFramesDirectoryDecodedOnGPU
+
+from tests.helpers import is_cuda_available
+
+NUMBER_OF_FRAMES = 24
+FRAME_VALUE_STEP = 10
+# NOTE: frames are lossy encoded, their decoded values are only close to the written ones
+FRAME_VALUE_TOLERANCE = FRAME_VALUE_STEP // 2
+
+@pytest.fixture(scope="module")
+def setup_video_frames_directory():
+    temporary_directory = tempfile.TemporaryDirectory()
+    
+    os.makedirs(os.path.join(temporary_directory.name, "video_0"))
+    
+    # NOTE: every frame has a uniform value depending on its index and a distinct value per channel, so that the decoded frames and channels order can be checked
+    for i in range(NUMBER_OF_FRAMES):
+        frame = np.full((16, 16, 3), i * FRAME_VALUE_STEP, dtype=np.uint8)
+        frame[..., 0] = 0
+        cv2.imwrite(os.path.join(temporary_directory.name, "video_0", f"img_{(i + 1):05d}.jpg"), frame)
+    
+    yield temporary_directory.name
+    
+    temporary_directory.cleanup()
+
+def assert_frames_match_indices(frames, indices):
+    assert frames.shape == (len(indices), 16, 16, 3)
+    # NOTE: the blue channel was written first by opencv, it must be the last one once converted to RGB
+    assert np.all(frames[..., 2] <= FRAME_VALUE_TOLERANCE)
+    assert np.all(np.abs(frames[..., 0].mean(axis=(1, 2)) - np.asarray(indices) * FRAME_VALUE_STEP) <= FRAME_VALUE_TOLERANCE)
+
+@pytest.mark.parametrize("start,stop,step", [
+    (0, 8, 1),
+    (18, 24, 1),
+    (0, 24, 3),
+    (20, 2, -4),
+])
+def test_video_frames_directory_slicing(setup_video_frames_directory, start, stop, step):
+    video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0")
+    
+    assert len(video) == NUMBER_OF_FRAMES
+    assert_frames_match_indices(video[start:stop:step], list(range(start, stop, step)))
+    assert_frames_match_indices(video[start][np.newaxis], [start])
+    assert_frames_match_indices(video.get_frames(start, stop, step), list(range(start, stop, step)))
+    
+def test_video_frames_directory_read_into(setup_video_frames_directory):
+    video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0")
+    
+    out = np.zeros((8, 16, 16, 3), dtype=np.uint8)
+    
+    assert video.read_into(4, 12, 2, out) == 4
+    assert_frames_match_indices(out[:4], [4, 6, 8, 10])
+    
+    with pytest.raises(ValueError):
+        video.read_into(0, 8, 1, np.zeros((8, 8, 8, 3), dtype=np.uint8))
+        
+def test_video_frames_directory_cache(setup_video_frames_directory, tmp_path):
+    video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0")
+    cached_video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0", cache_dir=str(tmp_path))
+    
+    assert os.path.exists(cached_video.cached_frames_path)
+    assert len(cached_video) == NUMBER_OF_FRAMES
+    
+    for start, stop, step in [(0, 8, 1), (0, 24, 3), (20, 2, -4)]:
+        frames = cached_video[start:stop:step]
+        
+        assert frames.flags.writeable and frames.flags.c_contiguous
+        assert (frames == video[start:stop:step]).all()
+    
+    assert (cached_video[5] == video[5]).all()
+    
+    out = np.zeros((8, 16, 16, 3), dtype=np.uint8)
+    
+    assert cached_video.read_into(4, 12, 2, out) == 4
+    assert (out[:4] == video[4:12:2]).all()
+    
+    # NOTE: an up to date cache is reused as is
+    modification_time = os.path.getmtime(cached_video.cached_frames_path)
+    
+    assert (VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0", cache_dir=str(tmp_path))[0:4] == video[0:4]).all()
+    assert os.path.getmtime(cached_video.cached_frames_path) == modification_time
+
+def test_video_frames_directory_cache_is_rebuilt_when_its_source_changes(tmp_path):
+    cache_dir = os.path.join(str(tmp_path), "cache")
+    
+    for videos_directory_name, frame_value in [("first", 40), ("second", 200)]:
+        os.makedirs(os.path.join(str(tmp_path), videos_directory_name, "video_0"))
+        
+        for i in range(4):
+            cv2.imwrite(os.path.join(str(tmp_path), videos_directory_name, "video_0", f"img_{(i + 1):05d}.jpg"), np.full((16, 16, 3), frame_value + i, dtype=np.uint8))
+    
+    first_video = VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "first"), "video_0", cache_dir=cache_dir)
+    
+    assert (first_video[0:4] == VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "first"), "video_0")[0:4]).all()
+    
+    # NOTE: same id and number of frames, but a different videos directory
+    second_video = VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "second"), "video_0", cache_dir=cache_dir)
+    
+    assert (second_video[0:4] == VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "second"), "video_0")[0:4]).all()
+    
+    # NOTE: a different starting_index gives different frames
+    shifted_video = VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "second"), "video_0", starting_index=2, cache_dir=cache_dir)
+    
+    assert len(shifted_video) == 3
+    assert (shifted_video[0:3] == second_video[1:4]).all()
+    
+    # NOTE: frames extracted again, with the same number of frames
+    for i in range(4):
+        cv2.imwrite(os.path.join(str(tmp_path), "first", "video_0", f"img_{(i + 1):05d}.jpg"), np.full((8, 8, 3), 120, dtype=np.uint8))
+    
+    reextracted_video = VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "first"), "video_0", cache_dir=cache_dir)
+    
+    assert reextracted_video[0:4].shape == (4, 8, 8, 3)
+    assert (reextracted_video[0:4] == VideoFromVideoFramesDirectory(os.path.join(str(tmp_path), "first"), "video_0")[0:4]).all()
+
+def test_video_frames_directory_path_with_percent(tmp_path):
+    videos_directory_path = os.path.join(str(tmp_path), "100%_videos")
+    
+    os.makedirs(os.path.join(videos_directory_path, "video_%d"))
+    
+    for i in range(4):
+        cv2.imwrite(os.path.join(videos_directory_path, "video_%d", f"img_{(i + 1):05d}.jpg"), np.zeros((16, 16, 3), dtype=np.uint8))
+        
+    video = VideoFromVideoFramesDirectory(videos_directory_path, "video_%d")
+    
+    assert video[0:4].shape == (4, 16, 16, 3)
+    
+def test_video_frames_directory_frames_cache(setup_video_frames_directory):
+    video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0")
+    cached_video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0", frames_cache_size=8)
+    
+    # NOTE: overlapping segments, the second one is partly served from the cache
+    assert (cached_video[0:8] == video[0:8]).all()
+    assert (cached_video[4:12] == video[4:12]).all()
+    assert len(cached_video.frames_cache) == 8
+    
+    # NOTE: modifying returned frames must not alter the cached ones
+    frames = cached_video[8:12]
+    frames[:] = 0
+    
+    assert (cached_video[8:12] == video[8:12]).all()
+    
+    out = np.zeros((4, 16, 16, 3), dtype=np.uint8)
+    
+    assert cached_video.read_into(6, 10, 1, out) == 4
+    assert (out == video[6:10]).all()
+    
+def test_video_frames_directory_frame_numbers(tmp_path):
+    os.makedirs(os.path.join(str(tmp_path), "video_0"))
+    
+    # NOTE: frames numbered with gaps, along with files that are not frames and a frame before the starting index
+    for frame_number in [0, 1, 2, 5, 11]:
+        frame = np.full((16, 16, 3), frame_number * FRAME_VALUE_STEP, dtype=np.uint8)
+        frame[..., 0] = 0
+        cv2.imwrite(os.path.join(str(tmp_path), "video_0", f"img_{frame_number:05d}.jpg"), frame)
+        
+    # NOTE: frame paths are built with a 5 digits number, so frames padded differently are not counted
+    for file_name in [".DS_Store", "notes.txt", "img_00003.png", "img_4.jpg", "img_000006.jpg"]:
+        open(os.path.join(str(tmp_path), "video_0", file_name), "w").close()
+        
+    video = VideoFromVideoFramesDirectory(str(tmp_path), "video_0")
+    
+    assert len(video) == 4
+    assert_frames_match_indices(video[0:4], [1, 2, 5, 11])
+
+@pytest.mark.skipif(not is_cuda_available() or importlib.util.find_spec("torchvision") is None, reason="torchvision or a CUDA device is not available")
+def test_video_frames_directory_decoded_on_gpu(setup_video_frames_directory, tmp_path):
+    video = VideoFromVideoFramesDirectory(setup_video_frames_directory, "video_0")
+    
+    for gpu_video in [
+        VideoFromVideoFramesDirectoryDecodedOnGPU(setup_video_frames_directory, "video_0"),
+        VideoFromVideoFramesDirectoryDecodedOnGPU(setup_video_frames_directory, "video_0", cache_dir=str(tmp_path)),
+    ]:
+        assert len(gpu_video) == NUMBER_OF_FRAMES
+        
+        frames = gpu_video[0:24:3]
+        
+        assert frames.is_cuda
+        assert tuple(frames.shape) == (8, 16, 16, 3)
+        # NOTE: nvJPEG and the cpu decoders may round differently
+        assert np.abs(frames.cpu().numpy().astype(np.int16) - video[0:24:3]).max() <= FRAME_VALUE_TOLERANCE
+        
+        with pytest.raises(ValueError):
+            gpu_video.read_into(0, 8, 1, np.zeros((8, 16, 16, 3), dtype=np.uint8))
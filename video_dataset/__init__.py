@@ -1,2 +1,3 @@
-from video_dataset.dataset import VideoDataset
-from video_dataset.dataset import VideoShapeComponents, DEFAULT_VIDEO_SHAPE
\ No newline at end of file
+from video_dataset.dataset import VideoDataset, VideoDatasetConfig
+from video_dataset.dataset import VideoShapeComponents, DEFAULT_VIDEO_SHAPE
+from video_dataset.prefetch import PrefetchedVideoDataset
\ No newline at end of file
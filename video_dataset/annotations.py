@@ -1,12 +1,12 @@
 import os
 import csv
 
+import numpy as np
+
 from typing import Union
-from abc import ABC, ABCMeta, abstractmethod
+from abc import ABC, abstractmethod
 
 class Annotations(ABC):
-    __metaclass__ = ABCMeta
-
     @abstractmethod
     def __init__(self, annotations_dir_path: str, id: str):
         pass
@@ -44,54 +44,58 @@ class AnnotationsFromFrameLevelTxtFileAnnotations(Annotations):
         self.fallback_annotation = fallback_annotation
         self.max_overflow_value = max_overflow_value
         
-        if not self.__does_annotations_file_exists():
+        self.annotations_path = os.path.join(self.annotations_dir_path, f"{self.id}.txt")
+        
+        try:
+            self.annotations = self.__load_annotations()
+        except FileNotFoundError:
             raise UndefinedAnnotationsException(f"No valid annotations file found for {id} in {annotations_dir_path}", self.id)
         
-    def __does_annotations_file_exists(self):
-        return os.path.exists(os.path.join(self.annotations_dir_path, f"{self.id}.txt"))
+        self.cached_number_of_annotations = len(self.annotations)
+        
+    def __load_annotations(self):
+        """
+        Read the annotations file once, each line being the annotation of a frame.
+        """
+        with open(self.annotations_path, 'r') as f:
+            return f.read().splitlines()
         
     def get_id(self):
         return self.id
     
     def __len__(self):
-        with open(os.path.join(self.annotations_dir_path, f"{self.id}.txt"), 'r') as f:
-            lines = f.readlines()
-            
-        return len(lines)
+        return self.cached_number_of_annotations
     
     def __getitem__(self, index: int | slice):
         if isinstance(index, int):
-            if index < 0 or index >= self.__len__() + self.max_overflow_value:
+            if index < 0 or index >= self.cached_number_of_annotations + self.max_overflow_value:
                 raise IndexError("Index out of bounds")
             return self.__get_annotation(index)
         elif isinstance(index, slice):
-            start, stop, step = index.indices(self.__len__() + self.max_overflow_value)
+            start, stop, step = index.indices(self.cached_number_of_annotations + self.max_overflow_value)
             return self.__get_annotations(start, stop, step)
         else:
             raise TypeError("Index must be an integer or slice")
         
     def __get_annotation(self, index: int):
-        with open(os.path.join(self.annotations_dir_path, f"{self.id}.txt"), 'r') as f:
-            lines = f.readlines()
-        
-        if index >= len(lines):
+        if index >= self.cached_number_of_annotations:
             return self.fallback_annotation
             
         # each line is an annotation for a frame
-        return lines[index]
+        return self.annotations[index]
         
     def __get_annotations(self, start: int, stop: int, step: int):
-        with open(os.path.join(self.annotations_dir_path, f"{self.id}.txt"), 'r') as f:
-            lines = f.readlines()
-            
-        # each line is an annotation for a frame
+        if step > 0:
+            # NOTE: list slicing stops at the last annotation, the remaining indices are overflow ones
+            annotations = self.annotations[start:stop:step]
+            return annotations + [self.fallback_annotation] * (len(range(start, stop, step)) - len(annotations))
         
         annotations = []
         for i in range(start, stop, step):
-            if i >= len(lines):
+            if i >= self.cached_number_of_annotations:
                 annotations.append(self.fallback_annotation)
             else:
-                annotations.append(lines[i])
+                annotations.append(self.annotations[i])
         
         return annotations
     
@@ -106,59 +110,87 @@ class AnnotationsFromSegmentLevelCsvFileAnnotations(Annotations):
         self.max_overflow_value = max_overflow_value
         self.delimiter = delimiter
         
-        if not self.__does_annotations_file_exists():
-            raise UndefinedAnnotationsException(f"No valid annotations file found for {id} in {annotations_dir_path}", self.id)
+        self.annotations_path = os.path.join(self.annotations_dir_path, f"{self.id}.csv")
         
-        self.annotations = self.__load_annotations()
+        try:
+            self.annotations = self.__load_annotations()
+        except FileNotFoundError:
+            raise UndefinedAnnotationsException(f"No valid annotations file found for {id} in {annotations_dir_path}", self.id)
         
-    def __does_annotations_file_exists(self):
-        return os.path.exists(os.path.join(self.annotations_dir_path, f"{self.id}.csv"))
+        self.cached_number_of_annotations = len(self.annotations)
         
     def __load_annotations(self):
         """
         Given a csv file with annotations for segments, load the annotations into a list of frame level annotations.
         """
-        annotations = []
-        max_frame = 0
+        starting_timestamps = []
+        ending_timestamps = []
+        actions = []
         
-        with open(os.path.join(self.annotations_dir_path, f"{self.id}.csv"), newline='') as file:
-            csv_reader = csv.DictReader(file, delimiter=self.delimiter)
+        with open(self.annotations_path, newline='') as file:
+            csv_reader = csv.reader(file, delimiter=self.delimiter)
+            
+            header = next(csv_reader, None)
+            
+            if header is None:
+                return []
+            
+            starting_timestamp_index = header.index('starting-timestamp')
+            ending_timestamp_index = header.index('ending-timestamp')
+            action_index = header.index('action')
             
             for row in csv_reader:
-                start_frame = int(float(row['starting-timestamp']) * self.fps / 1000)
-                end_frame = int(float(row['ending-timestamp']) * self.fps / 1000)
-                
-                if end_frame > max_frame:
-                    max_frame = end_frame
-                
-                while len(annotations) < start_frame:
-                    annotations.append(self.fallback_annotation)
-                
-                annotations.extend([row['action']] * (end_frame - start_frame + 1))
+                # NOTE: skip blank lines
+                if not row:
+                    continue
+                starting_timestamps.append(row[starting_timestamp_index])
+                ending_timestamps.append(row[ending_timestamp_index])
+                actions.append(row[action_index])
+        
+        if len(actions) == 0:
+            return []
+        
+        start_frames = (np.array(starting_timestamps, dtype=np.float64) * self.fps / 1000).astype(np.int64)
+        end_frames = (np.array(ending_timestamps, dtype=np.float64) * self.fps / 1000).astype(np.int64)
+        
+        annotations = []
+        
+        # NOTE: segments are appended in file order, gaps before a segment are filled with the fallback annotation,
+        # frames on a shared boundary or in an overlap are annotated once per segment covering them.
+        for start_frame, end_frame, action in zip(start_frames.tolist(), end_frames.tolist(), actions):
+            if len(annotations) < start_frame:
+                annotations.extend([self.fallback_annotation] * (start_frame - len(annotations)))
             
-            return annotations
+            annotations.extend([action] * (end_frame - start_frame + 1))
+        
+        return annotations
         
     def get_id(self):
         return self.id
     
     def __len__(self):
-        return len(self.annotations)
+        return self.cached_number_of_annotations
     
     def __getitem__(self, index: Union[int, slice]):
         if isinstance(index, int):
-            if index < 0 or index >= len(self) + self.max_overflow_value:
+            if index < 0 or index >= self.cached_number_of_annotations + self.max_overflow_value:
                 raise IndexError("Index out of bounds")
             return self.__get_annotation(index)
         elif isinstance(index, slice):
-            start, stop, step = index.indices(len(self) + self.max_overflow_value)
+            start, stop, step = index.indices(self.cached_number_of_annotations + self.max_overflow_value)
             return self.__get_annotations(start, stop, step)
         else:
             raise TypeError("Index must be an integer or slice")
         
     def __get_annotation(self, index: int):
-        if index >= len(self.annotations):
+        if index >= self.cached_number_of_annotations:
             return self.fallback_annotation
         return self.annotations[index]
     
     def __get_annotations(self, start: int, stop: int, step: int):
+        if step > 0:
+            # NOTE: list slicing stops at the last annotation, the remaining indices are overflow ones
+            annotations = self.annotations[start:stop:step]
+            return annotations + [self.fallback_annotation] * (len(range(start, stop, step)) - len(annotations))
+        
         return [self.__get_annotation(i) for i in range(start, stop, step)]
\ No newline at end of file
@@ -1,14 +1,18 @@
 import os
+import json
 import bisect
-import itertools
+import hashlib
+import importlib.util
+
+import numpy as np
 
 from enum import IntEnum
-from typing import Type, Any, Tuple, Dict, List, Optional, Callable
-from pydantic import BaseModel, Field, FilePath, DirectoryPath, PositiveInt, NonNegativeInt, field_validator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Type, Any, Tuple, Dict, Optional, Callable
+from pydantic import BaseModel, Field, FilePath, DirectoryPath, PositiveInt, NonNegativeInt, ValidationInfo, field_validator
 
-from video_dataset.padder import Padder
-from video_dataset.utils import better_listdir
-from video_dataset.video import Video, UndefinedVideoException
+from video_dataset.utils import LazyList, compile_transform, get_ids_from_directory, get_entries_signatures, load_json_cache, save_json_cache
+from video_dataset.video import Video, VideoFromVideoFramesDirectoryDecodedOnGPU
 from video_dataset.annotations import Annotations, UndefinedAnnotationsException
 
 class VideoShapeComponents(IntEnum):
@@ -19,6 +23,9 @@ class VideoShapeComponents(IntEnum):
     
 DEFAULT_VIDEO_SHAPE = (VideoShapeComponents.TIME, VideoShapeComponents.HEIGHT, VideoShapeComponents.WIDTH, VideoShapeComponents.CHANNELS)
 
+PREPARATION_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+SEGMENT_SIZE_CHECK_MAX_REPORTED_VIDEOS = 5
+
 class VideoDatasetConfig(BaseModel):
     annotations_dir: DirectoryPath
     videos_dir: DirectoryPath
@@ -36,12 +43,32 @@ class VideoDatasetConfig(BaseModel):
     ids_file: Optional[FilePath] = None
     frames_transform: Optional[Callable] = None
     annotations_transform: Optional[Callable] = None
+    # NOTE: transforms that are torch.nn.Module instances are compiled with torch.compile, has no effect if torch is not installed.
+    compile_transforms: bool = False
     
     allow_undefined_annotations: bool = False
     
     padder: Optional[Any] = None
     
     overlap: Optional[NonNegativeInt] = 0
+    
+    videos_lengths_cache_file: Optional[str] = None
+    max_loaded_videos: Optional[PositiveInt] = None
+    
+    # NOTE: only applies to single samples (__getitem__), a DataLoader with a batch_size reads its batches through __getitems__, which does not prefetch.
+    prefetch_next_segment: bool = False
+    
+    contiguous_frames: bool = False
+    
+    # NOTE: requires torch, the frames are returned as a torch.Tensor sharing the memory of the decoded frames, before frames_transform is applied.
+    frames_as_tensor: bool = False
+    
+    # NOTE: when enabled, returned frames share a per-process buffer and are only valid until the next sample is loaded, only use it if frames_transform copies them.
+    # Only applies to single samples (__getitem__), the batches read through __getitems__ (a DataLoader with a batch_size) are always allocated.
+    reuse_frames_buffer: bool = False
+    # NOTE: requires torch and a CUDA device, the reused frames buffer is allocated in page locked memory, so that copying the frames to the GPU does not need an extra staging copy.
+    # Like reuse_frames_buffer, only applies to __getitem__, use the DataLoader's pin_memory for batches.
+    pin_frames_buffer: bool = False
 
     @field_validator("video_processor")
     def check_video_processor(cls, v):
@@ -61,6 +88,51 @@ class VideoDatasetConfig(BaseModel):
             raise ValueError("Video shape must have exactly 4 unique components.")
         return v
 
+    @field_validator("overlap")
+    def check_overlap(cls, v, info: ValidationInfo):
+        segment_size = info.data.get("segment_size")
+        if v is not None and segment_size is not None and v >= segment_size:
+            raise ValueError("Overlap must be smaller than the segment size.")
+        return v
+
+    @field_validator("frames_as_tensor")
+    def check_frames_as_tensor(cls, v):
+        if v and importlib.util.find_spec("torch") is None:
+            raise ValueError("Frames can only be returned as tensors when torch is installed.")
+        return v
+
+    @field_validator("reuse_frames_buffer")
+    def check_reuse_frames_buffer(cls, v, info: ValidationInfo):
+        if v and info.data.get("prefetch_next_segment"):
+            raise ValueError("Frames buffer can't be reused when prefetching the next segment, as the prefetched segment would overwrite the current one.")
+        return v
+
+    @field_validator("pin_frames_buffer")
+    def check_pin_frames_buffer(cls, v, info: ValidationInfo):
+        if v and not info.data.get("reuse_frames_buffer"):
+            raise ValueError("Only a reused frames buffer can be pinned, enable reuse_frames_buffer.")
+        if v and importlib.util.find_spec("torch") is None:
+            raise ValueError("Frames buffer can only be pinned when torch is installed.")
+        if v:
+            import torch
+            
+            if not torch.cuda.is_available():
+                raise ValueError("Frames buffer can only be pinned when a CUDA device is available.")
+        return v
+
+    @field_validator("video_shape", "padder", "contiguous_frames", "frames_as_tensor", "reuse_frames_buffer")
+    def check_frames_decoded_on_gpu(cls, v, info: ValidationInfo):
+        video_processor = info.data.get("video_processor")
+        
+        if video_processor is None or not issubclass(video_processor, VideoFromVideoFramesDirectoryDecodedOnGPU):
+            return v
+        
+        is_enabled = tuple(v) != tuple(DEFAULT_VIDEO_SHAPE) if info.field_name == "video_shape" else (v is not None and v is not False)
+        
+        if is_enabled:
+            raise ValueError(f"{info.field_name} can't be used with {video_processor.__name__}, its frames are torch tensors on the GPU, use frames_transform instead.")
+        return v
+
     @field_validator("video_processor_kwargs", "annotations_processor_kwargs", mode="before")
     def check_kwargs(cls, v):
         if v is not None and not isinstance(v, dict):
@@ -81,72 +153,339 @@ class VideoDatasetConfig(BaseModel):
     
 class VideoDataset():
     def __init__(self, **kwargs):
-        configuration = VideoDatasetConfig(**kwargs)
+        self.__initialize(VideoDatasetConfig(**kwargs))
+        
+    @classmethod
+    def from_config(cls, configuration: VideoDatasetConfig):
+        """
+        Create a dataset from an already validated configuration, skipping validation.
+        Note that the configuration's values are not copied, they are shared with the dataset.
+        """
+        dataset = cls.__new__(cls)
+        dataset.__initialize(configuration)
+        return dataset
         
-        self.__dict__.update(configuration.model_dump())
+    def __initialize(self, configuration: VideoDatasetConfig):
+        # NOTE: read the fields directly instead of going through model_dump, which deep copies every value.
+        for field_name in type(configuration).model_fields:
+            setattr(self, field_name, getattr(configuration, field_name))
+            
+        if self.frames_as_tensor:
+            import torch
+            
+            self.frames_to_tensor = torch.from_numpy
+        else:
+            self.frames_to_tensor = None
+            
+        if self.compile_transforms:
+            self.frames_transform = compile_transform(self.frames_transform)
+            self.annotations_transform = compile_transform(self.annotations_transform)
 
         if self.ids_file is None:
-            self.ids = list(map(lambda file_name: os.path.splitext(file_name)[0], better_listdir(self.videos_dir)))
+            self.ids = get_ids_from_directory(self.videos_dir)
         else:
             with open(self.ids_file, "r") as file:
                 self.ids = file.read().splitlines()
             
-        self.videos, self.annotations = self.__prepare_videos_and_annotations()
+        self.__compute_segment_constants()
+        self.__reset_process_state()
+        
+        self.annotations = self.__prepare_annotations()
+        self.videos_lengths = self.__prepare_videos_lengths()
+        
+        self.number_of_segments_per_video, self.cumulative_number_of_segments_array = self.__prepare_segments_index()
+        self.cached_number_of_segments = int(self.cumulative_number_of_segments_array[-1]) if self.cumulative_number_of_segments_array.size > 0 else 0
+        # NOTE: plain list copy of the running totals, bisect on a list is cheaper than numpy for a single index
+        self.cumulative_number_of_segments = self.cumulative_number_of_segments_array.tolist()
+        
+        self.transpose_axes = tuple(int(component) for component in self.video_shape)
+        self.needs_transpose = self.transpose_axes != tuple(int(component) for component in DEFAULT_VIDEO_SHAPE)
         
         self.__segment_size_check()
         
-    def __prepare_videos_and_annotations(self):
-        videos = []
-        annotations = []
+    def __compute_segment_constants(self):
+        """
+        Per sample constants, computed once instead of on every access.
+        """
+        self.segment_stride = self.segment_size - self.overlap
+        self.target_segment_size = self.segment_size // self.step
+        self.number_of_frames_per_segment = len(range(0, self.segment_size, self.step))
         
-        for id in self.ids:
-            video = self.video_processor(self.videos_dir, id, **self.video_processor_kwargs)
-                
-            try:
-                annotation = self.annotations_processor(self.annotations_dir, id, **self.annotations_processor_kwargs)
-            except UndefinedAnnotationsException as exception:
-                if self.allow_undefined_annotations:
-                    if self.verbose:
-                        print(f"[warning]: {exception.message}")
-                    annotation = None
-                else:
-                    raise exception
+    def __reset_process_state(self):
+        """
+        (Re)create the state that is specific to a process: the video processors, which may hold open containers, the prefetch thread, the frames buffer and the last accessed video.
+        """
+        # NOTE: video processors are only instantiated the first time they are accessed.
+        self.videos = LazyList(len(self.ids), self.__prepare_video, max_loaded_items=self.max_loaded_videos)
+        
+        self.__prefetch_executor = None
+        self.__prefetch_executor_pid = None
+        self.__prefetched_segment = None
+        
+        self.__frames_buffer = None
+        
+        # NOTE: (video index, video, annotations) of the last accessed video, stored as a single tuple so it is always updated atomically
+        self.__last_accessed_video = (-1, None, None)
+        
+    def __getstate__(self):
+        """
+        Only the ids, configuration and precomputed index are pickled, e.g when sending the dataset to DataLoader workers. Video processors are created again, lazily, in the worker.
+        """
+        state = self.__dict__.copy()
+        
+        # NOTE: private attributes are stored under their mangled names
+        for attribute_name in ["videos", "_VideoDataset__prefetch_executor", "_VideoDataset__prefetch_executor_pid", "_VideoDataset__prefetched_segment", "_VideoDataset__frames_buffer", "_VideoDataset__last_accessed_video"]:
+            state.pop(attribute_name, None)
+            
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__compute_segment_constants()
+        self.__reset_process_state()
+        
+    def __prepare_annotations(self):
+        # NOTE: building the processors is mostly i/o (opening files, probing containers), which releases the GIL, so a thread pool overlaps it.
+        with ThreadPoolExecutor(max_workers=PREPARATION_MAX_WORKERS) as executor:
+            return list(executor.map(self.__prepare_annotation, self.ids))
+    
+    def __prepare_videos_lengths(self):
+        """
+        Get the number of frames of every video. When a videos_lengths_cache_file is given, lengths of videos that did not change since the last run are read from it and their processors are not instantiated.
+        """
+        if self.videos_lengths_cache_file is None:
+            cache = {}
+            signatures = {}
+        else:
+            cache = load_json_cache(self.videos_lengths_cache_file)
+            signatures = get_entries_signatures(self.videos_dir)
+            
+        cached_videos = cache.setdefault(self.__get_videos_lengths_cache_key(), {})
+        
+        def get_video_length(index):
+            id = self.ids[index]
+            cached_video = cached_videos.get(id)
             
-            videos.append(video)
-            annotations.append(annotation)
+            if cached_video is not None and signatures.get(id) is not None and cached_video["signature"] == signatures[id]:
+                return cached_video["length"]
             
-        return videos, annotations
+            return len(self.videos[index])
+        
+        with ThreadPoolExecutor(max_workers=PREPARATION_MAX_WORKERS) as executor:
+            videos_lengths = list(executor.map(get_video_length, range(len(self.ids))))
+            
+        if self.videos_lengths_cache_file is not None:
+            for id, video_length in zip(self.ids, videos_lengths):
+                if signatures.get(id) is not None:
+                    cached_videos[id] = { "signature": signatures[id], "length": video_length }
+            
+            try:
+                save_json_cache(self.videos_lengths_cache_file, cache)
+            except OSError as exception:
+                if self.verbose:
+                    print(f"[warning]: could not write videos lengths cache file {self.videos_lengths_cache_file}: {exception}")
+                    
+        return np.asarray(videos_lengths, dtype=np.int64)
+    
+    def __get_videos_lengths_cache_key(self):
+        """
+        Key of this dataset's lengths in the videos lengths cache file. The lengths depend on the video processor, its kwargs (e.g starting_index) and the videos directory, so all of them are part of the key.
+        """
+        # NOTE: values json can't serialize are keyed by their repr, at worst such kwargs never hit the cache
+        video_processor_kwargs = json.dumps(self.video_processor_kwargs or {}, sort_keys=True, default=repr)
+        digest = hashlib.sha1(f"{os.path.abspath(self.videos_dir)}\0{video_processor_kwargs}".encode()).hexdigest()
+        
+        return f"{self.video_processor.__name__}:{digest}"
+    
+    def __prepare_video(self, index):
+        return self.video_processor(self.videos_dir, self.ids[index], **self.video_processor_kwargs)
+    
+    def __prepare_annotation(self, id):
+        try:
+            return self.annotations_processor(self.annotations_dir, id, **self.annotations_processor_kwargs)
+        except UndefinedAnnotationsException as exception:
+            if self.allow_undefined_annotations:
+                if self.verbose:
+                    print(f"[warning]: {exception.message}")
+                return None
+            else:
+                raise exception
+    
+    def __prepare_segments_index(self):
+        """
+        Compute once the number of segments of each video and their running total, used to map a virtual index to a video.
+        """
+        number_of_segments_per_video = np.maximum(0, self.videos_lengths - self.overlap) // self.segment_stride
+        cumulative_number_of_segments = np.cumsum(number_of_segments_per_video, dtype=np.int64)
+        
+        return number_of_segments_per_video, cumulative_number_of_segments
         
     def __segment_size_check(self):
-        if self.padder is None:
-            for index, video in enumerate(self.videos):
-                remaining_segments = len(video) % self.segment_size
-                if remaining_segments != 0:
-                    if self.verbose:
-                        print(f"[warning]: {remaining_segments} frames will be lost, because video {index} has {len(video)} frames, which is not divisible by segment size {self.segment_size}. consider using a padder.")
+        if self.padder is None and self.verbose:
+            remaining_frames = self.videos_lengths % self.segment_size
+            offending_videos_indices = np.flatnonzero(remaining_frames)
+            
+            if offending_videos_indices.size > 0:
+                first_offending_videos = ", ".join(f"{self.ids[index]} ({remaining_frames[index]} frames lost)" for index in offending_videos_indices[:SEGMENT_SIZE_CHECK_MAX_REPORTED_VIDEOS].tolist())
+                print(f"[warning]: {offending_videos_indices.size} videos have a number of frames not divisible by segment size {self.segment_size}, their remaining frames will be lost. consider using a padder. first offending videos: {first_offending_videos}.")
 
     def __len__(self):
-        return sum([(max(0, len(video) - self.overlap) // (self.segment_size - self.overlap)) for video in self.videos])
+        return self.cached_number_of_segments
 
     def __getitem__(self, virtual_video_index):
+        if not self.prefetch_next_segment:
+            return self.__getitem_virtual__(virtual_video_index)
+        
+        prefetched_virtual_video_index, sample = self.__wait_for_prefetched_segment()
+        
+        if prefetched_virtual_video_index != virtual_video_index or sample is None:
+            sample = self.__getitem_virtual__(virtual_video_index)
+        
+        if virtual_video_index + 1 < len(self):
+            self.__prefetch_segment(virtual_video_index + 1)
+        
+        return sample
+    
+    def __getitem_virtual__(self, virtual_video_index):
         video_index, starting_frame_number_in_video = self.__translate_virtual_video_index_to_video_index(virtual_video_index)
         
+        return self.__getitem_segment__(video_index, starting_frame_number_in_video)
+    
+    def __prefetch_segment(self, virtual_video_index):
+        """
+        Load the given segment in a background thread, so that its decoding overlaps with whatever the caller does with the current sample.
+        """
+        # NOTE: the executor is created lazily and per process, as threads do not survive the fork of DataLoader workers.
+        if self.__prefetch_executor is None or self.__prefetch_executor_pid != os.getpid():
+            self.__prefetch_executor = ThreadPoolExecutor(max_workers=1)
+            self.__prefetch_executor_pid = os.getpid()
+            
+        self.__prefetched_segment = (virtual_video_index, self.__prefetch_executor.submit(self.__getitem_virtual__, virtual_video_index))
+        
+    def __wait_for_prefetched_segment(self):
+        """
+        Wait for the pending prefetch, if any, so that processors are never read from two threads at once.
+        Returns the prefetched index and sample, the sample being None if there was nothing prefetched or the prefetch failed.
+        """
+        if self.__prefetched_segment is None:
+            return None, None
+        
+        virtual_video_index, future = self.__prefetched_segment
+        self.__prefetched_segment = None
+        
+        # NOTE: a failed prefetch is simply retried, so that the error is raised from the caller's thread.
+        if future.exception() is not None:
+            return virtual_video_index, None
+        
+        return virtual_video_index, future.result()
+    
+    def __getitems__(self, virtual_video_indices):
+        """
+        Batched version of __getitem__, used automatically by PyTorch's DataLoader, translating all the indices in a single vectorized lookup.
+        The next segment is not prefetched and the frames buffer is neither reused nor pinned, prefetch_next_segment, reuse_frames_buffer and pin_frames_buffer only apply to __getitem__.
+        """
+        if self.prefetch_next_segment:
+            self.__wait_for_prefetched_segment()
+            
+        video_indices, starting_frame_numbers_in_videos = self.__translate_virtual_video_indices_to_video_indices(virtual_video_indices)
+        
+        # NOTE: group the batch by video, so each video reads all of its segments in one request, in increasing order.
+        segments_per_video = {}
+        for slot, (video_index, starting_frame_number_in_video) in enumerate(zip(video_indices, starting_frame_numbers_in_videos)):
+            segments_per_video.setdefault(video_index, []).append((starting_frame_number_in_video, slot))
+            
+        samples = [None] * len(video_indices)
+        
+        for video_index in sorted(segments_per_video.keys()):
+            segments = sorted(segments_per_video[video_index])
+            
+            ranges = [(starting_frame_number_in_video, starting_frame_number_in_video + self.segment_size) for starting_frame_number_in_video, _ in segments]
+            segments_frames = self.videos[video_index].get_segments(ranges, self.step)
+            
+            for (starting_frame_number_in_video, slot), frames in zip(segments, segments_frames):
+                samples[slot] = (self.__process_frames(frames), self.__getitem_annotations__(video_index, starting_frame_number_in_video))
+        
+        return samples
+    
+    def __getitem_segment__(self, video_index, starting_frame_number_in_video):
         frames = self.__getitem_frames__(video_index, starting_frame_number_in_video)
         annotations = self.__getitem_annotations__(video_index, starting_frame_number_in_video)
     
         return frames, annotations
     
+    def __get_video_and_annotations(self, video_index):
+        """
+        Get the processors of the given video, sequential samplers hitting the same video many times in a row skip the lookups.
+        """
+        last_accessed_video_index, video, annotations = self.__last_accessed_video
+        
+        if last_accessed_video_index != video_index:
+            video, annotations = self.videos[video_index], self.annotations[video_index]
+            self.__last_accessed_video = (video_index, video, annotations)
+            
+        return video, annotations
+    
     def __getitem_frames__(self, video_index, starting_frame_number_in_video):
         starting_frame = starting_frame_number_in_video
         ending_frame = starting_frame_number_in_video + self.segment_size
         
-        frames = self.videos[video_index][starting_frame:ending_frame:self.step]
+        video, _ = self.__get_video_and_annotations(video_index)
+        
+        if self.reuse_frames_buffer:
+            frames = self.__read_frames_into_buffer(video, starting_frame, ending_frame)
+        else:
+            frames = video.get_frames(starting_frame, ending_frame, self.step)
+        
+        return self.__process_frames(frames)
+    
+    def __read_frames_into_buffer(self, video, starting_frame, ending_frame):
+        """
+        Read the frames into the frames buffer, avoiding a new allocation per sample. The buffer is the first full segment read, so it matches the videos frames shape.
+        """
+        if self.__frames_buffer is not None:
+            try:
+                number_of_frames = video.read_into(starting_frame, ending_frame, self.step, self.__frames_buffer)
+                return self.__frames_buffer[:number_of_frames]
+            except ValueError:
+                # NOTE: the video's frames have a different shape than the buffer's
+                pass
+        
+        frames = video.get_frames(starting_frame, ending_frame, self.step)
+        
+        if len(frames) == self.number_of_frames_per_segment:
+            if self.pin_frames_buffer:
+                frames = self.__pin_frames(frames)
+                
+            self.__frames_buffer = frames
+            
+        return frames
+    
+    def __pin_frames(self, frames):
+        """
+        Copy the frames into a page locked array, allocated once as it is much slower to allocate than regular memory.
+        """
+        import torch
+        
+        pinned_frames = torch.empty(frames.shape, dtype=torch.uint8, pin_memory=True).numpy()
+        pinned_frames[...] = frames
         
+        return pinned_frames
+    
+    def __process_frames(self, frames):
         # NOTE: we expect the video_processor to return a numpy array of the frames in the DEFAULT_VIDEO_SHAPE format.
-        frames = frames.transpose(self.video_shape)
+        if self.needs_transpose:
+            frames = frames.transpose(self.transpose_axes)
         
         if self.padder is not None:
-            frames, _ = self.padder(frames=frames, annotations=None,  target_segment_size=self.segment_size // self.step)
+            frames, _ = self.padder(frames=frames, annotations=None,  target_segment_size=self.target_segment_size)
+        
+        # NOTE: a permuted video_shape gives a strided view, make it contiguous in a single pass so that tensor conversions downstream do not copy it again. no-op when the frames are already contiguous.
+        if self.contiguous_frames:
+            frames = np.ascontiguousarray(frames)
+        
+        # NOTE: from_numpy does not copy, the tensor is backed by the frames' memory. a strided view (permuted video_shape) is kept strided, unless contiguous_frames is set.
+        if self.frames_to_tensor is not None:
+            frames = self.frames_to_tensor(frames)
         
         if self.frames_transform is not None:
             frames = self.frames_transform(frames)
@@ -157,7 +496,7 @@ class VideoDataset():
         starting_frame = starting_frame_number_in_video
         ending_frame = starting_frame_number_in_video + self.segment_size
         
-        video_annotations = self.annotations[video_index]
+        _, video_annotations = self.__get_video_and_annotations(video_index)
         
         if video_annotations is None and self.allow_undefined_annotations:
             return None
@@ -165,7 +504,7 @@ class VideoDataset():
             annotations = video_annotations[starting_frame:ending_frame:self.step]
             
             if self.padder is not None:
-                _, annotations = self.padder(frames=None, annotations=annotations,  target_segment_size=self.segment_size // self.step)
+                _, annotations = self.padder(frames=None, annotations=annotations,  target_segment_size=self.target_segment_size)
             
             if self.annotations_transform is not None:
                 annotations = self.annotations_transform(annotations)
@@ -173,19 +512,28 @@ class VideoDataset():
             return annotations
     
     def __translate_virtual_video_index_to_video_index(self, virtual_video_index):
-        video_index = 0
+        cumulative_number_of_segments = self.cumulative_number_of_segments
         
-        videos_cropped_frames_number = [len(video) // self.segment_size for video in self.videos]
+        video_index = bisect.bisect_right(cumulative_number_of_segments, virtual_video_index)
         
-        cumulative_videos_cropped_frames_number = list(itertools.accumulate(videos_cropped_frames_number))
+        if video_index >= len(cumulative_number_of_segments):
+            raise ValueError("Virtual video index is out of range.")
+
+        previous_segments = 0 if video_index == 0 else cumulative_number_of_segments[video_index - 1]
+        segment_index_within_video = virtual_video_index - previous_segments
+        starting_frame_number_in_video = segment_index_within_video * self.segment_stride
+        
+        return video_index, starting_frame_number_in_video
+    
+    def __translate_virtual_video_indices_to_video_indices(self, virtual_video_indices):
+        virtual_video_indices = np.asarray(virtual_video_indices, dtype=np.int64)
         
-        video_index = bisect.bisect_right(cumulative_videos_cropped_frames_number, virtual_video_index)
+        video_indices = np.searchsorted(self.cumulative_number_of_segments_array, virtual_video_indices, side="right")
         
-        if video_index >= len(videos_cropped_frames_number):
+        if np.any(virtual_video_indices < 0) or np.any(video_indices >= len(self.cumulative_number_of_segments_array)):
             raise ValueError("Virtual video index is out of range.")
-
-        previous_frames = 0 if video_index == 0 else cumulative_videos_cropped_frames_number[video_index - 1]
-        segment_index_within_video = virtual_video_index - previous_frames
-        starting_frame_number_in_video = segment_index_within_video * (self.segment_size - self.overlap)
         
-        return video_index, starting_frame_number_in_video
\ No newline at end of file
+        previous_segments = np.where(video_indices == 0, 0, self.cumulative_number_of_segments_array[np.maximum(video_indices - 1, 0)])
+        starting_frame_numbers_in_videos = (virtual_video_indices - previous_segments) * self.segment_stride
+        
+        return video_indices.tolist(), starting_frame_numbers_in_videos.tolist()
\ No newline at end of file
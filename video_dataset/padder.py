@@ -1,11 +1,9 @@
 import numpy as np
 
 from typing import List, Any
-from abc import ABC, ABCMeta, abstractmethod
+from abc import ABC, abstractmethod
 
 class Padder(ABC):
-    __metaclass__ = ABCMeta
-    
     @abstractmethod
     def __init__(self):
         pass
@@ -28,8 +26,15 @@ class ValuePadder(Padder):
         return frames_padded, annotations_padded
     
     def __pad_frames(self, frames: np.ndarray, target_segment_size: int):
-        frames_padded = np.full((target_segment_size, *frames.shape[1:]), self.frames_padding_value, dtype=frames.dtype)
-        frames_padded[:frames.shape[0]] = frames
+        number_of_frames = frames.shape[0]
+        
+        if target_segment_size - number_of_frames <= 0:
+            return frames  # No need to pad
+        
+        # NOTE: only the padded frames are filled, the others are written once by the copy
+        frames_padded = np.empty((target_segment_size, *frames.shape[1:]), dtype=frames.dtype)
+        frames_padded[:number_of_frames] = frames
+        frames_padded[number_of_frames:].fill(self.frames_padding_value)
         
         return frames_padded
     
@@ -57,8 +62,12 @@ class LastValuePadder(Padder):
         if pad_length <= 0:
             return frames  # No need to pad
         
-        last_frame = frames[-1:]  # Correctly extract the last frame
-        frames_padded = np.vstack([frames] + [last_frame] * pad_length)  # Stack repeated frames
+        number_of_frames = frames.shape[0]
+        
+        frames_padded = np.empty((target_segment_size, *frames.shape[1:]), dtype=frames.dtype)
+        frames_padded[:number_of_frames] = frames
+        # NOTE: the last frame is broadcasted over all the padded frames in a single write
+        frames_padded[number_of_frames:] = frames[-1]
 
         return frames_padded
     
@@ -0,0 +1,54 @@
+import os
+
+from collections import deque
+from typing import Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from video_dataset.dataset import VideoDataset
+
+DEFAULT_PREFETCH_NUMBER_OF_THREADS = min(8, os.cpu_count() or 1)
+
+class PrefetchedVideoDataset():
+    """
+    Iterate over the samples of a dataset while background threads load the next ones, so that decoding overlaps with whatever the caller does with the current sample (e.g the training step).
+    Samples are yielded in the order of the indices, at most prefetch_size samples being loaded ahead, by default twice the number of threads.
+    """
+    
+    def __init__(self, dataset: VideoDataset, indices: Optional[Sequence[int]] = None, number_of_threads: int = DEFAULT_PREFETCH_NUMBER_OF_THREADS, prefetch_size: Optional[int] = None):
+        if number_of_threads < 1:
+            raise ValueError("Number of threads must be at least 1.")
+        
+        if prefetch_size is not None and prefetch_size < 1:
+            raise ValueError("Prefetch size must be at least 1.")
+        
+        # NOTE: samples loaded concurrently would overwrite each other in the shared buffer
+        if dataset.reuse_frames_buffer:
+            raise ValueError("Can't prefetch samples of a dataset reusing its frames buffer.")
+        
+        self.dataset = dataset
+        self.indices = indices
+        self.number_of_threads = number_of_threads
+        self.prefetch_size = prefetch_size if prefetch_size is not None else 2 * number_of_threads
+    
+    def __len__(self):
+        return len(self.dataset) if self.indices is None else len(self.indices)
+    
+    def __iter__(self):
+        indices = iter(range(len(self.dataset)) if self.indices is None else self.indices)
+        
+        executor = ThreadPoolExecutor(max_workers=self.number_of_threads)
+        pending_samples = deque()
+        
+        try:
+            for index in indices:
+                # NOTE: the dataset's own single segment prefetching is bypassed, it is not meant to be used from several threads
+                pending_samples.append(executor.submit(self.dataset.__getitem_virtual__, index))
+                
+                if len(pending_samples) >= self.prefetch_size:
+                    yield pending_samples.popleft().result()
+            
+            while len(pending_samples) > 0:
+                yield pending_samples.popleft().result()
+        finally:
+            # NOTE: when the iteration is stopped early, the samples that did not start loading yet are dropped
+            executor.shutdown(wait=True, cancel_futures=True)
\ No newline at end of file
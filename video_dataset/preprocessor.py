@@ -1,6 +1,13 @@
 import os
+import shutil
+import subprocess
 
-def extract_frames_from_videos(videos_dir: str, output_dir: str, output_extension: str = "jpg", verbose: bool = True):
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from video_dataset.utils import better_listdir
+
+def extract_frames_from_videos(videos_dir: str, output_dir: str, output_extension: str = "jpg", verbose: bool = True, max_workers: Optional[int] = None):
     """
     Extract frames from all video files in the specified directory and save them as image files.
     Note that you must have ffmpeg already installed on your computer for this function to work properly.
@@ -10,6 +17,7 @@ def extract_frames_from_videos(videos_dir: str, output_dir: str, output_extensio
         output_dir (str): The directory where the extracted frames will be saved.
         output_extension (str): The image format for saving the frames (default is "jpg").
         verbose (bool): If True, prints progress messages during extraction (default is True).
+        max_workers (Optional[int]): The number of videos extracted in parallel (default is the number of cpus).
         
     Returns:
         None
@@ -17,10 +25,14 @@ def extract_frames_from_videos(videos_dir: str, output_dir: str, output_extensio
     This method iterates over all video files in the specified `videos_dir`, creates a subfolder for each video 
     in the `output_dir`, and extracts frames from each video using ffmpeg. The frames are saved as images with 
     the specified `output_extension` in the respective video subfolders.
+    Each video is extracted by its own single threaded ffmpeg process, `max_workers` of them running at the same time.
     """
-    videos = sorted([os.path.join(videos_dir, video_file_name) for video_file_name in os.listdir(videos_dir)])
+    if shutil.which("ffmpeg") is None:
+        raise FileNotFoundError("ffmpeg was not found, make sure it is installed and available in the PATH.")
+    
+    videos = sorted([os.path.join(videos_dir, video_file_name) for video_file_name in better_listdir(videos_dir)])
     
-    for video in videos:
+    def extract_frames_from_video(video):
         video_name = os.path.splitext(os.path.basename(video))[0]
         
         output_video_dir = os.path.join(output_dir, video_name)
@@ -28,14 +40,31 @@ def extract_frames_from_videos(videos_dir: str, output_dir: str, output_extensio
         if os.path.exists(output_video_dir):
             if verbose:
                 print(f"[INFO]: frames for \"{video_name}\" already exist. skipping extraction.")
-            continue
+            return
         
         os.makedirs(output_video_dir)
         
         if verbose:
             print(f"[INFO]: extracting frames from {video_name}...")
         
-        os.system(f"ffmpeg -i {video} {output_video_dir}/img_%05d.{output_extension}")
+        # NOTE: arguments are passed as a list, without going through a shell, so paths with spaces or special characters are safe.
+        # NOTE: each ffmpeg is limited to a single thread, as the parallelism comes from extracting several videos at once.
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-threads", "1", "-i", video, "-threads", "1", os.path.join(output_video_dir, f"img_%05d.{output_extension}")],
+            stdin=subprocess.DEVNULL
+        )
+        
+        if result.returncode != 0:
+            # NOTE: remove the partially extracted frames, so that the video is not skipped on the next run
+            shutil.rmtree(output_video_dir, ignore_errors=True)
+            
+            if verbose:
+                print(f"[warning]: could not extract frames from {video_name}, ffmpeg exited with code {result.returncode}.")
+            return
         
         if verbose:
-            print(f"[INFO]: frames from {video_name} extracted successfully.")
\ No newline at end of file
+            print(f"[INFO]: frames from {video_name} extracted successfully.")
+    
+    # NOTE: the work happens in the ffmpeg processes, threads are enough to wait for them.
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        list(executor.map(extract_frames_from_video, videos))
\ No newline at end of file
@@ -1,4 +1,181 @@
 import os
+import json
+import tempfile
+import threading
+
+from typing import Optional
+from collections import OrderedDict
 
 def better_listdir(path):
-    return list(filter(lambda file_name: file_name != ".DS_Store", os.listdir(path)))
\ No newline at end of file
+    return [file_name for file_name in os.listdir(path) if file_name != ".DS_Store"]
+
+def get_ids_from_directory(path):
+    """
+    List the ids of the entries of the given directory, i.e their names without extension, sorted so that the order does not depend on the filesystem.
+    """
+    ids = []
+    
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name = entry.name
+            if name == ".DS_Store":
+                continue
+            # NOTE: rfind is cheaper than os.path.splitext, a leading dot is part of the name, not an extension
+            extension_index = name.rfind(".")
+            ids.append(name[:extension_index] if extension_index > 0 else name)
+    
+    ids.sort()
+    
+    return ids
+
+def get_entries_signatures(path):
+    """
+    Map the name without extension of every entry of the given directory to a (modification time, size) signature, using a single directory scan.
+    For directories (videos stored as frames), the modification time changes whenever frames are added or removed.
+    """
+    signatures = {}
+    
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name == ".DS_Store":
+                continue
+            stat = entry.stat()
+            signatures[os.path.splitext(entry.name)[0]] = [stat.st_mtime_ns, stat.st_size]
+            
+    return signatures
+
+# NOTE: one read buffer per thread, see read_file_into_thread_buffer
+thread_read_buffers = threading.local()
+
+def read_file_into_thread_buffer(path):
+    """
+    Read a whole file into a buffer reused by the calling thread, instead of allocating a new bytes object per file.
+    The returned memoryview is only valid until the next call from the same thread.
+    """
+    with open(path, "rb", buffering=0) as file:
+        size = os.fstat(file.fileno()).st_size
+        
+        buffer = getattr(thread_read_buffers, "buffer", None)
+        
+        if buffer is None or len(buffer) < size:
+            buffer = bytearray(size)
+            thread_read_buffers.buffer = buffer
+            
+        view = memoryview(buffer)[:size]
+        number_of_bytes = file.readinto(view)
+        
+    return view[:number_of_bytes]
+
+def load_json_cache(path):
+    """
+    Load a json cache file, returning an empty cache if it is missing or unreadable.
+    """
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+    
+def save_json_cache(path, cache):
+    """
+    Atomically write a json cache file, so that concurrent readers never see a partially written file.
+    """
+    # NOTE: the temporary file name is unique per call, so that threads of the same process never write the same file
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False) as file:
+        json.dump(cache, file)
+        
+    os.replace(file.name, path)
+
+def compile_transform(transform):
+    """
+    Compile the given transform with torch.compile when it is a torch.nn.Module, so that its operations run as fused kernels.
+    Any other transform, or any transform when torch is not installed, is returned as is.
+    """
+    try:
+        import torch
+    except ImportError:
+        return transform
+    
+    if not isinstance(transform, torch.nn.Module):
+        return transform
+    
+    # NOTE: compilation itself is lazy, it happens on the first call, i.e in each DataLoader worker
+    return torch.compile(transform, mode="reduce-overhead", dynamic=False)
+
+class LazyList():
+    """
+    Fixed size list whose items are created, by calling factory(index), only the first time they are accessed.
+    When max_loaded_items is given, the least recently accessed items are dropped once more items than that are loaded, and created again on their next access.
+    """
+    
+    def __init__(self, length: int, factory, max_loaded_items: Optional[int] = None):
+        self.factory = factory
+        self.items = [None] * length
+        self.max_loaded_items = max_loaded_items
+        self.loaded_indices = OrderedDict()
+        self.lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.items)
+    
+    def __getitem__(self, index: int):
+        index = range(len(self.items))[index]
+        
+        item = self.items[index]
+        
+        if item is None:
+            item = self.factory(index)
+            self.items[index] = item
+            
+        if self.max_loaded_items is not None:
+            self.__mark_as_recently_used(index)
+            
+        return item
+    
+    def __mark_as_recently_used(self, index: int):
+        with self.lock:
+            self.loaded_indices[index] = None
+            self.loaded_indices.move_to_end(index)
+            
+            while len(self.loaded_indices) > self.max_loaded_items:
+                evicted_index, _ = self.loaded_indices.popitem(last=False)
+                self.items[evicted_index] = None
+    
+    def is_loaded(self, index: int):
+        return self.items[index] is not None
+        
+class LRUCache():
+    """
+    Thread safe mapping keeping at most max_size items, the least recently accessed ones being dropped first.
+    Items are not pickled, a pickled cache is restored empty.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self.items)
+        
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            
+            self.items.move_to_end(key)
+            return self.items[key]
+        
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+                
+    def __getstate__(self):
+        return { "max_size": self.max_size }
+    
+    def __setstate__(self, state):
+        self.__init__(state["max_size"])
\ No newline at end of file
@@ -1,15 +1,41 @@
 import os
+import re
 import cv2
+import tempfile
+import threading
 
 import numpy as np
 
-from PIL import Image
-from video_dataset.utils import better_listdir
-from abc import ABC, ABCMeta, abstractmethod
+from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from video_dataset.utils import LRUCache, load_json_cache, save_json_cache, read_file_into_thread_buffer
+from abc import ABC, abstractmethod
 
-class Video(ABC):
-    __metaclass__ = ABCMeta
+# NOTE: PyTurboJPEG is optional, when it or libjpeg-turbo is not installed the frames are decoded with OpenCV.
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    turbo_jpeg = None
+
+# NOTE: PyAV is optional, it is only required by VideoFromVideoFileWithPyAV and by VideoFromVideoFile when probing with PyAV.
+try:
+    import av
+except ImportError:
+    av = None
 
+# NOTE: hardware acceleration is only available in recent PyAV releases, older ones can still decode on the cpu.
+try:
+    from av.codec.hwaccel import HWAccel, hwdevices_available
+except ImportError:
+    HWAccel = None
+
+class Video(ABC):
+    """
+    Video processors are not pickled along with the dataset, they are created again in each DataLoader worker.
+    Subclasses holding a decoder or container should open it lazily, on the first frames access, rather than in __init__.
+    """
+    
     @abstractmethod
     def __init__(self, videos_dir_path: str, id: str):
         pass
@@ -27,9 +53,32 @@ class Video(ABC):
         """
         Get the frame(s) in the video file.
         Note that even if an index is given the frames will be returned in a batch format (Number of frames, Height, Width, Channels).
+        Frames are expected to be a C-contiguous uint8 numpy array, so that no extra copy is needed downstream.
         """
         pass
     
+    def get_frames(self, start: int, stop: int, step: int = 1):
+        """
+        Same as self[start:stop:step], subclasses can override it to skip the index type dispatch of __getitem__, as it is called for every sample.
+        """
+        return self[start:stop:step]
+    
+    def get_segments(self, ranges: List[Tuple[int, int]], step: int = 1):
+        """
+        Get the frames of several (start, stop) ranges of the video at once, returned in the same order as the ranges.
+        Subclasses can override it to share work between the ranges, e.g. a single container open and increasing seeks.
+        """
+        return [self.get_frames(start, stop, step) for start, stop in ranges]
+    
+    def read_into(self, start: int, stop: int, step: int, out: np.ndarray):
+        """
+        Read the frames of the given range into the preallocated out array of shape (Number of frames or more, Height, Width, Channels), returning the number of frames read.
+        Raises a ValueError if the frames do not fit in out. Subclasses can override it to decode directly into out instead of allocating a new array.
+        """
+        frames = self.get_frames(start, stop, step)
+        out[:len(frames)] = frames
+        return len(frames)
+    
 class UndefinedVideoException(Exception):
     """
     Raised when no valid video file is found for a given video ID.
@@ -42,126 +91,731 @@ class UndefinedVideoException(Exception):
         self.id = id
 
 STARTING_INDEX = 1
+FRAME_FILE_NAME_PATTERN = re.compile(r"img_(\d{5})\.jpg")
+FRAMES_READING_MAX_WORKERS = os.cpu_count() or 1
+# NOTE: number of frames decoded at once when writing the decoded frames cache, bounding the memory used
+FRAMES_CACHE_WRITING_CHUNK_SIZE = 256
 
 class VideoFromVideoFramesDirectory(Video):
-    def __init__(self, videos_dir_path, id, starting_index = STARTING_INDEX):
+    # NOTE: shared by all the videos of a process, created lazily as threads do not survive the fork of DataLoader workers.
+    __frames_reading_executor = None
+    __frames_reading_executor_pid = None
+    
+    def __init__(self, videos_dir_path, id, starting_index = STARTING_INDEX, cache_dir = None, frames_cache_size = 0):
+        """
+        When a cache_dir is given, the frames are decoded once into a raw file of that directory, which is then memory mapped instead of decoding the frames on every access.
+        The cache is rebuilt when the frames directory, starting_index, the frames shape or the frames files change. It takes about 3 times the space of the JPEG frames.
+        When frames_cache_size is positive, up to that many of the last decoded frames are kept in memory, so that overlapping segments do not decode their shared frames again.
+        """
         super().__init__(videos_dir_path, id)
         
         self.id = id
         self.videos_dir_path = videos_dir_path
         self.starting_index = starting_index
+        self.cache_dir = cache_dir
+        self.frames_cache = LRUCache(frames_cache_size) if frames_cache_size > 0 else None
+        
+        # NOTE: paths are built once here instead of joining the same components for every frame.
+        self.video_directory_path = os.path.join(self.videos_dir_path, self.id)
+        # NOTE: % formatting is cheaper than an f-string with a format spec, the directory's own % characters are escaped.
+        self.frame_path_format = os.path.join(self.video_directory_path.replace("%", "%%"), "img_%05d.jpg")
         
         if not self.__does_video_video_exists():
             raise UndefinedVideoException(f"No valid video file found for {id} in {videos_dir_path}", self.id)
         
+        # NOTE: the frames are listed once, only their numbers are kept, sorted, the i-th frame being the i-th smallest number.
+        self.frame_numbers = self.__scan_frame_numbers()
+        self.cached_number_of_frames = int(self.frame_numbers.size)
+        
+        # NOTE: the memory map is opened on the first frames access, so that it is not pickled along with the video.
+        self.__cached_frames = None
+        self.cached_frames_path = None
+        self.cached_frames_shape = None
+        
+        if self.cache_dir is not None:
+            self.cached_frames_path = os.path.join(self.cache_dir, f"{self.id}.rgb")
+            self.cached_frames_shape = self.__ensure_cached_frames()
+        
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_VideoFromVideoFramesDirectory__cached_frames"] = None
+        return state
+        
+    def __ensure_cached_frames(self):
+        """
+        Write the decoded frames cache if it is missing or outdated, returning the frames shape, or None if the video has no frames.
+        """
+        if self.cached_number_of_frames == 0:
+            return None
+        
+        metadata_path = os.path.join(self.cache_dir, f"{self.id}.json")
+        metadata = load_json_cache(metadata_path)
+        
+        source = self.__get_cached_frames_source()
+        shape = tuple(source["shape"])
+        
+        if metadata.get("source") == source and os.path.exists(self.cached_frames_path):
+            return shape
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        # NOTE: written to a temporary file first, so that other processes never map a partially written cache,
+        # its name is unique per call as the same video can be built by several threads at once
+        temporary_file_descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{self.id}.", suffix=".rgb.tmp")
+        os.close(temporary_file_descriptor)
+        
+        cached_frames = np.memmap(temporary_path, dtype=np.uint8, mode="w+", shape=shape)
+        
+        for chunk_start in range(0, self.cached_number_of_frames, FRAMES_CACHE_WRITING_CHUNK_SIZE):
+            chunk_stop = min(chunk_start + FRAMES_CACHE_WRITING_CHUNK_SIZE, self.cached_number_of_frames)
+            self.__read_frames_into(range(chunk_start, chunk_stop), np.asarray(cached_frames[chunk_start:chunk_stop]))
+        
+        cached_frames.flush()
+        del cached_frames
+        
+        os.replace(temporary_path, self.cached_frames_path)
+        save_json_cache(metadata_path, { "source": source })
+        
+        return shape
+    
+    def __get_cached_frames_source(self):
+        """
+        Describe the frames the decoded frames cache is built from, the cache is rebuilt whenever the description changes.
+        """
+        directory_stat = os.stat(self.video_directory_path)
+        first_frame_stat = os.stat(self.frame_path_format % self.frame_numbers[0])
+        last_frame_stat = os.stat(self.frame_path_format % self.frame_numbers[-1])
+        
+        return {
+            "directory": os.path.abspath(self.video_directory_path),
+            "starting_index": self.starting_index,
+            "shape": [self.cached_number_of_frames, *self.__get_frame(0).shape],
+            # NOTE: the directory changes when frames are added or removed, the frames files when they are written again, e.g when the frames are extracted again
+            "signature": [directory_stat.st_mtime_ns, first_frame_stat.st_mtime_ns, first_frame_stat.st_size, last_frame_stat.st_mtime_ns, last_frame_stat.st_size],
+        }
+    
+    def __get_cached_frames(self):
+        if self.__cached_frames is None:
+            self.__cached_frames = np.memmap(self.cached_frames_path, dtype=np.uint8, mode="r", shape=self.cached_frames_shape)
+            
+        return self.__cached_frames
+        
+    def __scan_frame_numbers(self):
+        """
+        Get the sorted numbers of the frames of the video directory, files not named like a frame and frames numbered before starting_index are ignored.
+        """
+        match_frame_file_name = FRAME_FILE_NAME_PATTERN.fullmatch
+        
+        with os.scandir(self.video_directory_path) as entries:
+            frame_numbers = np.fromiter((int(match.group(1)) for match in map(match_frame_file_name, (entry.name for entry in entries)) if match is not None), dtype=np.int32)
+            
+        frame_numbers.sort()
+        
+        return frame_numbers[np.searchsorted(frame_numbers, self.starting_index):]
+        
     def __does_video_video_exists(self):
-        return os.path.exists(os.path.join(self.videos_dir_path, self.id))
+        return os.path.exists(self.video_directory_path)
     
     def get_id(self):
         return self.id
     
     def __len__(self):
-        return len(better_listdir(os.path.join(self.videos_dir_path, self.id)))
+        return self.cached_number_of_frames
     
     def __getitem__(self, index: int | slice):
         if isinstance(index, int):
-            if index < 0 or index >= self.__len__():
+            if index < 0 or index >= self.cached_number_of_frames:
                 raise IndexError("Index out of bounds")
             return self.__get_frame(index)
         elif isinstance(index, slice):
-            start, stop, step = index.indices(self.__len__())
+            start, stop, step = index.indices(self.cached_number_of_frames)
             return self.__get_frames(start, stop, step)
         else:
             raise TypeError("Index must be an integer or slice")
         
+    def get_frames(self, start: int, stop: int, step: int = 1):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        return self.__get_frames(start, stop, step)
+        
+    def read_into(self, start: int, stop: int, step: int, out: np.ndarray):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        indices = range(start, stop, step)
+        
+        if len(indices) > len(out):
+            raise ValueError("Not enough space in out for the requested frames.")
+        
+        if self.cached_frames_shape is not None:
+            out[:len(indices)] = self.__get_cached_frames()[start:stop:step]
+        else:
+            self.__read_frames_into(indices, out)
+        
+        return len(indices)
+    
+    @classmethod
+    def __get_frames_reading_executor(cls):
+        if cls.__frames_reading_executor is None or cls.__frames_reading_executor_pid != os.getpid():
+            cls.__frames_reading_executor = ThreadPoolExecutor(max_workers=FRAMES_READING_MAX_WORKERS)
+            cls.__frames_reading_executor_pid = os.getpid()
+            
+        return cls.__frames_reading_executor
+    
+    def __decode_frame(self, index: int, out: np.ndarray = None):
+        """
+        Decode the frame in RGB, in shape (height, width, channels), directly into out when it is given.
+        """
+        image_path = self.frame_path_format % self.frame_numbers[index]
+        
+        if turbo_jpeg is not None:
+            # NOTE: the decoding threads each reuse a read buffer, the frame is decoded before the thread reads another file
+            return turbo_jpeg.decode(read_file_into_thread_buffer(image_path), pixel_format=TJPF_RGB, dst=out)
+        
+        # NOTE: opencv returns the image in BGR
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        
+        if image is None:
+            raise FileNotFoundError(f"Could not read frame {image_path}")
+        
+        if out is not None and image.shape != out.shape:
+            raise ValueError(f"Frame of shape {image.shape} does not fit in out of shape {out.shape}.")
+        
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=out)
+        
+    def __read_frames_into(self, indices: range, out: np.ndarray):
+        # NOTE: libjpeg-turbo and opencv release the GIL while decoding, so the frames are decoded in parallel.
+        executor = VideoFromVideoFramesDirectory.__get_frames_reading_executor()
+        
+        # NOTE: consuming the results propagates the exceptions raised in the threads.
+        list(executor.map(self.__load_frame, indices, [out[i] for i in range(len(indices))]))
+        
+    def __load_frame(self, index: int, out: np.ndarray = None):
+        """
+        Get the frame from the frames cache, or decode it and add it to the cache.
+        """
+        if self.frames_cache is None:
+            return self.__decode_frame(index, out)
+        
+        frame = self.frames_cache.get(index)
+        
+        if frame is None:
+            frame = self.__decode_frame(index, out)
+            # NOTE: a copy is cached, as the returned frame can be modified by the caller
+            self.frames_cache.put(index, frame.copy())
+            return frame
+        
+        if out is None:
+            return frame.copy()
+        
+        if frame.shape != out.shape:
+            raise ValueError(f"Frame of shape {frame.shape} does not fit in out of shape {out.shape}.")
+        
+        out[...] = frame
+        return out
+        
     def __get_frame(self, index: int):
-        image_path = os.path.join(self.videos_dir_path, self.id, f"img_{(index + self.starting_index):05d}.jpg")
+        if self.cached_frames_shape is not None:
+            return np.array(self.__get_cached_frames()[index])
         
-        # NOTE: PIL return the image in shape (width, height, channels), converting it to a numpy array will give it in shape (height, width, channels)
-        return np.array(Image.open(image_path).convert("RGB"))
+        return self.__load_frame(index)
     
     def __get_frames(self, start: int, stop: int, step: int):
-        frames = []
+        if self.cached_frames_shape is not None:
+            # NOTE: copied out of the read only memory map, into a contiguous array
+            return np.array(self.__get_cached_frames()[start:stop:step])
+        
+        indices = range(start, stop, step)
+        
+        if len(indices) == 0:
+            return np.empty((0,), dtype=np.uint8)
         
-        for i in range(start, stop, step):
-            frame = self.__get_frame(i)
-            frames.append(frame)
+        # NOTE: the first frame gives the frames shape, the others are decoded directly in place.
+        first_frame = self.__get_frame(indices[0])
         
         # NOTE: will be of shape (number of frames, height, width, channels)
-        return np.array(frames)
+        frames = np.empty((len(indices), *first_frame.shape), dtype=np.uint8)
+        frames[0] = first_frame
+        
+        self.__read_frames_into(indices[1:], frames[1:])
+        
+        return frames
     
+class VideoFromVideoFramesDirectoryDecodedOnGPU(VideoFromVideoFramesDirectory):
+    """
+    Same as VideoFromVideoFramesDirectory, but the frames of a slice are decoded in a single batch on the GPU by nvJPEG, through torchvision.
+    Frames are returned as a uint8 torch.Tensor of shape (Number of frames, Height, Width, Channels) on the given device, so they can't be used with padders, contiguous_frames, frames_as_tensor, reuse_frames_buffer or a custom video_shape, use frames_transform instead.
+    When cache_dir or frames_cache_size is given, the frames are read from these caches as by VideoFromVideoFramesDirectory and copied to the device.
+    Requires torch, torchvision and a CUDA device.
+    """
+    
+    def __init__(self, videos_dir_path, id, starting_index = STARTING_INDEX, cache_dir = None, frames_cache_size = 0, device = "cuda"):
+        super().__init__(videos_dir_path, id, starting_index=starting_index, cache_dir=cache_dir, frames_cache_size=frames_cache_size)
+        
+        try:
+            import torch
+            import torchvision.io
+        except ImportError:
+            raise ImportError("torch and torchvision are required to use VideoFromVideoFramesDirectoryDecodedOnGPU.")
+        
+        if not torch.cuda.is_available():
+            raise RuntimeError("A CUDA device is required to use VideoFromVideoFramesDirectoryDecodedOnGPU.")
+        
+        self.device = device
+        
+    def __getitem__(self, index: int | slice):
+        if isinstance(index, int):
+            if index < 0 or index >= self.cached_number_of_frames:
+                raise IndexError("Index out of bounds")
+            return self.__decode_frames(index, index + 1, 1)[0]
+        elif isinstance(index, slice):
+            start, stop, step = index.indices(self.cached_number_of_frames)
+            return self.__decode_frames(start, stop, step)
+        else:
+            raise TypeError("Index must be an integer or slice")
+        
+    def get_frames(self, start: int, stop: int, step: int = 1):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        return self.__decode_frames(start, stop, step)
+        
+    def read_into(self, start: int, stop: int, step: int, out: np.ndarray):
+        raise ValueError("Frames decoded on the GPU can't be read into a numpy array.")
+    
+    def __decode_frames(self, start: int, stop: int, step: int):
+        import torch
+        import torchvision.io
+        
+        indices = range(start, stop, step)
+        
+        if len(indices) == 0:
+            return torch.empty((0,), dtype=torch.uint8, device=self.device)
+        
+        if self.cache_dir is not None or self.frames_cache is not None:
+            return torch.from_numpy(super().get_frames(start, stop, step)).to(self.device)
+        
+        # NOTE: files are read on the cpu, all of them are then decoded by a single batched nvJPEG call.
+        data = [torchvision.io.read_file(self.frame_path_format % self.frame_numbers[index]) for index in indices]
+        frames = torchvision.io.decode_jpeg(data, mode=torchvision.io.ImageReadMode.RGB, device=self.device)
+        
+        # NOTE: decoded frames are in shape (channels, height, width), will be of shape (number of frames, height, width, channels)
+        return torch.stack(frames).permute(0, 2, 3, 1)
+    
+# NOTE: seeking makes the decoder restart from the previous keyframe, reaching a frame this close ahead is cheaper by decoding up to it.
+MAX_FORWARD_DECODED_FRAMES = 32
+
+SUPPORTED_VIDEO_EXTENSIONS = ["mp4", "avi", "mkv", "mov", "webm"]
+
+def find_video_extension(videos_dir_path, id, extensions=SUPPORTED_VIDEO_EXTENSIONS):
+    """
+    Get the extension of the video file of the given id, or None if there is no video file for it.
+    """
+    video_path_prefix = os.path.join(videos_dir_path, f"{id}.")
+    for extension in extensions:
+        if os.path.exists(video_path_prefix + extension):
+            return extension
+    return None
+
+def probe_video_with_pyav(video_path):
+    """
+    Get the number of frames, height and width of a video from its container metadata, without opening its decoder.
+    The number of frames is estimated from the duration when the container does not store it, and is 0 when neither is available.
+    """
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        
+        num_frames = stream.frames
+        
+        # NOTE: some containers do not store the number of frames, it is then estimated from the duration
+        if num_frames == 0 and stream.duration is not None and stream.average_rate is not None:
+            num_frames = int(round(stream.duration * stream.time_base * stream.average_rate))
+            
+        return num_frames, stream.height, stream.width
+
 class VideoFromVideoFile(Video):
-    SUPPORTED_VIDEO_EXTENSIONS = ["mp4", "avi", "mkv", "mov", "webm"]
+    SUPPORTED_VIDEO_EXTENSIONS = SUPPORTED_VIDEO_EXTENSIONS
+    # NOTE: "any" lets OpenCV pick the first available backend (e.g VAAPI on linux, D3D11 on windows), decoding falls back to the cpu when none is available.
+    HARDWARE_ACCELERATIONS = {
+        "any": cv2.VIDEO_ACCELERATION_ANY,
+        "vaapi": cv2.VIDEO_ACCELERATION_VAAPI,
+        "d3d11": cv2.VIDEO_ACCELERATION_D3D11,
+        "mfx": cv2.VIDEO_ACCELERATION_MFX,
+    }
     
-    def __init__(self, videos_dir_path, id, video_extension=None):
+    def __init__(self, videos_dir_path, id, video_extension=None, hardware_acceleration=None, probe_with_pyav=False):
+        """
+        When probe_with_pyav is True, the number of frames is read from the container metadata with PyAV instead of being reported by OpenCV, which is cheaper but can give a different count.
+        Files PyAV can't probe are probed with OpenCV.
+        """
         super().__init__(videos_dir_path, id)
         
         self.id = id
         self.videos_dir_path = videos_dir_path
+        
+        if hardware_acceleration is not None and hardware_acceleration not in VideoFromVideoFile.HARDWARE_ACCELERATIONS:
+            raise ValueError(f"Unsupported hardware acceleration {hardware_acceleration}, expected one of {list(VideoFromVideoFile.HARDWARE_ACCELERATIONS.keys())}.")
+        
+        if probe_with_pyav and av is None:
+            raise ImportError("PyAV is required to probe videos with PyAV, install it with `pip install av`.")
+        
+        self.hardware_acceleration = hardware_acceleration
+        self.probe_with_pyav = probe_with_pyav
         self.video_extension = video_extension or VideoFromVideoFile.__is_video_file(self.videos_dir_path, self.id)
 
         if not self.video_extension:
             raise UndefinedVideoException(f"No valid video file found for {id} in {videos_dir_path}", self.id)
 
         self.video_path = os.path.join(self.videos_dir_path, f"{self.id}.{self.video_extension}")
-        self.cached_number_of_frames = self.__cache_number_of_frames()
+        self.cached_number_of_frames, self.frame_height, self.frame_width = self.__probe_video()
+        
+        # NOTE: the capture is opened on the first frames access and kept open, once per process as it can't be shared with forked DataLoader workers.
+        self.__capture = None
+        self.__capture_pid = None
+        # NOTE: index of the frame the capture will decode next, used to avoid seeking when frames are read in order.
+        self.__next_frame_index = 0
+        self.__lock = threading.Lock()
         
     @staticmethod
     def __is_video_file(videos_dir_path, id):
-        for extension in VideoFromVideoFile.SUPPORTED_VIDEO_EXTENSIONS:
-            if os.path.exists(os.path.join(videos_dir_path, f"{id}.{extension}")):
-                return extension
-        return None
+        return find_video_extension(videos_dir_path, id, VideoFromVideoFile.SUPPORTED_VIDEO_EXTENSIONS)
         
     def get_id(self):
         return self.id
     
-    def __cache_number_of_frames(self):
-        """Opens video temporarily to get frame count."""
-        video = cv2.VideoCapture(os.path.join(self.videos_dir_path, f"{self.id}.{self.video_extension}"))
+    def __probe_video(self):
+        """Opens video temporarily to get frame count and frames size."""
+        # NOTE: PyAV reads them from the container metadata, cheaper than opening an OpenCV capture, which sets up the decoder.
+        if self.probe_with_pyav:
+            try:
+                num_frames, height, width = probe_video_with_pyav(self.video_path)
+            except Exception:
+                # NOTE: whatever the reason PyAV can't probe the file, OpenCV still can
+                num_frames = 0
+            
+            if num_frames > 0:
+                return num_frames, height, width
+            
+        video = cv2.VideoCapture(self.video_path)
         num_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
         video.release()
-        return num_frames
+        return num_frames, height, width
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # NOTE: captures can't be pickled, it is opened again on the next frames access.
+        state["_VideoFromVideoFile__capture"] = None
+        del state["_VideoFromVideoFile__lock"]
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+        
+    def close(self):
+        """
+        Release the capture, it is opened again on the next frames access.
+        """
+        with self.__lock:
+            if self.__capture is not None:
+                self.__capture.release()
+                self.__capture = None
 
     def __len__(self):
         return self.cached_number_of_frames
 
     def __getitem__(self, index: int | slice):
         if isinstance(index, int):
-            if index < 0 or index >= self.__len__():
+            if index < 0 or index >= self.cached_number_of_frames:
                 raise IndexError("Index out of bounds")
             return self.__get_frame(index)
         elif isinstance(index, slice):
-            start, stop, step = index.indices(self.__len__())
+            start, stop, step = index.indices(self.cached_number_of_frames)
             return self.__get_frames(start, stop, step)
         else:
             raise TypeError("Index must be an integer or slice")
+        
+    def get_frames(self, start: int, stop: int, step: int = 1):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        return self.__get_frames(start, stop, step)
+        
+    def read_into(self, start: int, stop: int, step: int, out: np.ndarray):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        
+        if len(range(start, stop, step)) > len(out):
+            raise ValueError("Not enough space in out for the requested frames.")
+        
+        return self.__read_frames(start, stop, step, out)
+    
+    def __get_capture(self):
+        if self.__capture is None or self.__capture_pid != os.getpid():
+            if self.hardware_acceleration is None:
+                self.__capture = cv2.VideoCapture(self.video_path)
+            else:
+                # NOTE: decoded frames are copied back to host memory, so they are read exactly like software decoded ones.
+                self.__capture = cv2.VideoCapture(self.video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_HW_ACCELERATION, VideoFromVideoFile.HARDWARE_ACCELERATIONS[self.hardware_acceleration]])
+            self.__capture_pid = os.getpid()
+            self.__next_frame_index = 0
+            
+            # NOTE: PyAV probes the coded frames size while OpenCV applies the rotation stored in the container, so the size of the decoded frames is taken from the capture.
+            if self.__capture.isOpened():
+                self.frame_height = int(self.__capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                self.frame_width = int(self.__capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            
+        return self.__capture
+    
+    def __seek(self, capture, index: int):
+        """Move the capture so that the next decoded frame is the given one."""
+        distance = index - self.__next_frame_index
+        
+        if 0 <= distance <= MAX_FORWARD_DECODED_FRAMES:
+            # NOTE: grab decodes without converting the frame, cheaper than read
+            for _ in range(distance):
+                capture.grab()
+        else:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            
+        self.__next_frame_index = index
+    
+    def __read_frames(self, start: int, stop: int, step: int, out: np.ndarray):
+        """Decodes the frames of the range directly into out, returning the number of frames read."""
+        # NOTE: the capture and its position are shared, so a video is read by a single thread at a time.
+        with self.__lock:
+            capture = self.__get_capture()
+            
+            number_of_frames = 0
+            
+            for i in range(start, stop, step):
+                if i != self.__next_frame_index:
+                    self.__seek(capture, i)
+                
+                frame_out = out[number_of_frames]
+                
+                # NOTE: the frame is decoded directly into out, opencv only allocates a new frame when it does not fit
+                ret, frame = capture.read(frame_out)
+                
+                if not ret:
+                    # NOTE: the frame count reported by the container can be larger than the number of decodable frames, the capture is reopened on the next access.
+                    self.__capture.release()
+                    self.__capture = None
+                    break
+                
+                self.__next_frame_index = i + 1
+                
+                if frame.shape != frame_out.shape:
+                    raise ValueError(f"Frame of shape {frame.shape} does not fit in out of shape {out.shape}.")
+                
+                # NOTE: return in the shape (height, width, channels), BGR to RGB is done in place when the frame was decoded into out
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame_out)
+                number_of_frames += 1
+                
+            return number_of_frames
 
     def __get_frame(self, index: int):
-        """Opens video, retrieves a single frame, and immediately closes it."""
-        with cv2.VideoCapture(self.videos_dir_path) as video:
-            video.set(cv2.CAP_PROP_POS_FRAMES, index)
-            # NOTE: return in the shape (height, width, channels)
-            ret, frame = video.read()
+        frames = self.__get_frames(index, index + 1, 1)
         
-        if not ret:
+        if len(frames) == 0:
             raise Exception(f"Could not read frame at index {index}")
         
-        return np.array(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        return frames[0]
 
     def __get_frames(self, start: int, stop: int, step: int):
-        """Reads multiple frames in a single open-close cycle."""
-        frames = []
+        """Reads the frames with the persistent capture, seeking only when the frames are not right after the previously read ones."""
+        # NOTE: the capture is opened first, as it sets the size of the decoded frames
+        with self.__lock:
+            self.__get_capture()
+        
+        # NOTE: will be of shape (number of frames, height, width, channels)
+        frames = np.empty((len(range(start, stop, step)), self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        
+        number_of_frames = self.__read_frames(start, stop, step, frames)
+        
+        return frames[:number_of_frames]
+    
+class VideoFromVideoFileWithPyAV(Video):
+    """
+    Same as VideoFromVideoFile, but demuxing and decoding with PyAV, which seeks by timestamp to the previous keyframe and decodes with FFmpeg's own threads.
+    Frame indices are derived from the frames timestamps, so the video is expected to have a constant frame rate. Requires PyAV to be installed.
+    hardware_acceleration is an FFmpeg device type (e.g "cuda" for NVDEC), decoded frames are copied back to host memory and decoding falls back to the cpu when the device can't be used.
+    """
+    SUPPORTED_VIDEO_EXTENSIONS = SUPPORTED_VIDEO_EXTENSIONS
+    
+    def __init__(self, videos_dir_path, id, video_extension=None, thread_type="AUTO", hardware_acceleration=None):
+        super().__init__(videos_dir_path, id)
+        
+        if av is None:
+            raise ImportError("PyAV is required to use VideoFromVideoFileWithPyAV, install it with `pip install av`.")
+        
+        if hardware_acceleration is not None and HWAccel is None:
+            raise ImportError(f"PyAV {av.__version__} does not support hardware acceleration, upgrade it with `pip install --upgrade av`.")
+        
+        if hardware_acceleration is not None and hardware_acceleration not in hwdevices_available():
+            raise ValueError(f"Unsupported hardware acceleration {hardware_acceleration}, expected one of {hwdevices_available()}.")
+        
+        self.id = id
+        self.videos_dir_path = videos_dir_path
+        self.thread_type = thread_type
+        self.hardware_acceleration = hardware_acceleration
+        self.video_extension = video_extension or find_video_extension(self.videos_dir_path, self.id, VideoFromVideoFileWithPyAV.SUPPORTED_VIDEO_EXTENSIONS)
+        
+        if not self.video_extension:
+            raise UndefinedVideoException(f"No valid video file found for {id} in {videos_dir_path}", self.id)
         
-        with cv2.VideoCapture(self.videos_dir_path) as video:
-            video.set(cv2.CAP_PROP_POS_FRAMES, start)
+        self.video_path = os.path.join(self.videos_dir_path, f"{self.id}.{self.video_extension}")
+        self.cached_number_of_frames, self.frame_height, self.frame_width = self.__probe_video()
+        
+        # NOTE: the container is opened on the first frames access and kept open, once per process as it can't be shared with forked DataLoader workers.
+        self.__container = None
+        self.__container_pid = None
+        self.__decoded_frames = None
+        # NOTE: index of the frame the decoder will return next, None when unknown, used to avoid seeking when frames are read in order.
+        self.__next_frame_index = None
+        self.__lock = threading.Lock()
+        
+    def get_id(self):
+        return self.id
+    
+    def __probe_video(self):
+        """Opens video temporarily to get frame count and frames size."""
+        return probe_video_with_pyav(self.video_path)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # NOTE: containers can't be pickled, it is opened again on the next frames access.
+        state["_VideoFromVideoFileWithPyAV__container"] = None
+        state["_VideoFromVideoFileWithPyAV__decoded_frames"] = None
+        state["_VideoFromVideoFileWithPyAV__next_frame_index"] = None
+        del state["_VideoFromVideoFileWithPyAV__lock"]
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+        
+    def close(self):
+        """
+        Close the container, it is opened again on the next frames access.
+        """
+        with self.__lock:
+            if self.__container is not None:
+                self.__container.close()
+                self.__container = None
+                self.__decoded_frames = None
+                self.__next_frame_index = None
+    
+    def __len__(self):
+        return self.cached_number_of_frames
+    
+    def __getitem__(self, index: int | slice):
+        if isinstance(index, int):
+            if index < 0 or index >= self.cached_number_of_frames:
+                raise IndexError("Index out of bounds")
+            return self.__get_frame(index)
+        elif isinstance(index, slice):
+            start, stop, step = index.indices(self.cached_number_of_frames)
+            return self.__get_frames(start, stop, step)
+        else:
+            raise TypeError("Index must be an integer or slice")
+        
+    def get_frames(self, start: int, stop: int, step: int = 1):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        return self.__get_frames(start, stop, step)
+        
+    def read_into(self, start: int, stop: int, step: int, out: np.ndarray):
+        start, stop, step = slice(start, stop, step).indices(self.cached_number_of_frames)
+        
+        if len(range(start, stop, step)) > len(out):
+            raise ValueError("Not enough space in out for the requested frames.")
+        
+        return self.__read_frames(start, stop, step, out)
+    
+    def __get_stream(self):
+        if self.__container is None or self.__container_pid != os.getpid():
+            self.__container = None
             
-            for i in range(start, stop, step):
-                # NOTE: return in the shape (height, width, channels)
-                ret, frame = video.read()
-                if not ret:
+            if self.hardware_acceleration is not None:
+                try:
+                    self.__container = av.open(self.video_path, hwaccel=HWAccel(device_type=self.hardware_acceleration, allow_software_fallback=True))
+                except av.FFmpegError:
+                    # NOTE: the device could not be created, e.g no GPU is visible from this process
+                    pass
+                
+            if self.__container is None:
+                self.__container = av.open(self.video_path)
+            self.__container_pid = os.getpid()
+            self.__container.streams.video[0].thread_type = self.thread_type
+            self.__decoded_frames = None
+            self.__next_frame_index = None
+            
+        return self.__container.streams.video[0]
+    
+    def __get_frame_index(self, frame, stream):
+        return int(round((frame.time - (stream.start_time or 0) * stream.time_base) * stream.average_rate))
+    
+    def __seek(self, stream, index: int):
+        """Seek to the keyframe preceding the given frame, the frames before it are skipped while decoding."""
+        timestamp = int((stream.start_time or 0) + index / stream.average_rate / stream.time_base)
+        
+        self.__container.seek(timestamp, stream=stream, backward=True, any_frame=False)
+        self.__decoded_frames = self.__container.decode(stream)
+    
+    def __read_frames(self, start: int, stop: int, step: int, out: np.ndarray):
+        """Decodes the frames of the range in increasing order, placing each of them in out, returning the number of frames read."""
+        indices = range(start, stop, step)
+        
+        if len(indices) == 0:
+            return 0
+        
+        positions = { frame_index: position for position, frame_index in enumerate(indices) }
+        first_frame_index, last_frame_index = min(indices), max(indices)
+        
+        filled_positions = []
+        
+        # NOTE: the container and its decoding position are shared, so a video is read by a single thread at a time.
+        with self.__lock:
+            stream = self.__get_stream()
+            
+            distance = None if self.__next_frame_index is None else first_frame_index - self.__next_frame_index
+            
+            if self.__decoded_frames is None or distance is None or not 0 <= distance <= MAX_FORWARD_DECODED_FRAMES:
+                self.__seek(stream, first_frame_index)
+            
+            self.__next_frame_index = None
+            
+            for frame in self.__decoded_frames:
+                frame_index = self.__get_frame_index(frame, stream)
+                
+                if frame_index in positions:
+                    # NOTE: return in the shape (height, width, channels), converted to RGB by FFmpeg's swscale
+                    frame = frame.to_ndarray(format="rgb24")
+                    
+                    if frame.shape != out.shape[1:]:
+                        raise ValueError(f"Frame of shape {frame.shape} does not fit in out of shape {out.shape}.")
+                    
+                    out[positions[frame_index]] = frame
+                    filled_positions.append(positions[frame_index])
+                
+                if frame_index >= last_frame_index:
+                    if frame_index == last_frame_index:
+                        self.__next_frame_index = frame_index + 1
                     break
-                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         
+        # NOTE: frames past the last decodable one are dropped, the read ones are moved first, in the order of the range
+        if len(filled_positions) < len(indices):
+            filled_positions.sort()
+            out[:len(filled_positions)] = out[filled_positions]
+        
+        return len(filled_positions)
+    
+    def __get_frame(self, index: int):
+        frames = self.__get_frames(index, index + 1, 1)
+        
+        if len(frames) == 0:
+            raise Exception(f"Could not read frame at index {index}")
+        
+        return frames[0]
+    
+    def __get_frames(self, start: int, stop: int, step: int):
         # NOTE: will be of shape (number of frames, height, width, channels)
-        return np.array(frames)
\ No newline at end of file
+        frames = np.empty((len(range(start, stop, step)), self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        
+        number_of_frames = self.__read_frames(start, stop, step, frames)
+        
+        return frames[:number_of_frames]
\ No newline at end of file